@@ -1,13 +1,21 @@
+import os
+
 from setuptools import setup, find_packages
 
+ext_modules = []
+if os.environ.get("PROMPT_AUTO_REFACTOR_MYPYC") == "1":
+    # Opt-in ahead-of-time compilation of the analyzer (requires mypy)
+    from mypyc.build import mypycify
+    ext_modules = mypycify(["src/analyzer/code_analyzer.py"])
+
 setup(
     name="prompt-auto-refactor",
     version="1.0.0",
     description="A tool for automatic code refactoring based on natural language prompts",
     author="Claude Code Assistant",
     packages=find_packages(),
+    ext_modules=ext_modules,
     install_requires=[
-        "click>=8.1.0",
         "pytest>=7.4.0",
         "pytest-cov>=4.1.0",
     ],
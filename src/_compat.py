@@ -0,0 +1,7 @@
+"""Switches for features that depend on the Python version"""
+import sys
+from typing import Any, Dict
+
+# dataclass(slots=True) needs Python 3.10+; ``@dataclass(**DATACLASS_SLOTS)``
+# drops the per-instance __dict__ where it is supported
+DATACLASS_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
@@ -1,174 +1,325 @@
 import ast
+from array import array
+from collections import defaultdict
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Any
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Callable, Tuple, Union
+from src._compat import DATACLASS_SLOTS
 
 
-@dataclass
+@lru_cache(maxsize=32)
+def _parse_cached(code: str) -> ast.Module:
+    # The analyzer only reads trees, so one parse can be shared by every pass
+    return ast.parse(code)
+
+
+_HASH_MASK = (1 << 64) - 1
+
+_FunctionNode = Union[ast.FunctionDef, ast.AsyncFunctionDef]
+
+
+# Small integer code per AST node class, used instead of hashing class names
+_TYPE_CODES: Dict[type, int] = {
+    cls: code
+    for code, cls in enumerate(
+        obj for obj in vars(ast).values()
+        if isinstance(obj, type) and issubclass(obj, ast.AST)
+    )
+}
+_TYPE_NAMES: List[str] = [cls.__name__ for cls in _TYPE_CODES]
+
+
+def _structural_hash(node: ast.AST, memo: Dict[int, int]) -> int:
+    """Post-order Merkle hash of a subtree that ignores identifier names.
+    
+    Names, argument names and function names are left out of the hash so
+    that functions differing only by renames land in the same bucket.
+    Constants, attribute names and keyword names still take part. The hash
+    of each function is kept in memo under ``id(node)``, so nested functions
+    are hashed only once; the shared cached tree itself is never written to.
+    """
+    sig = memo.get(id(node))
+    if sig is not None:
+        return sig
+    
+    h = _TYPE_CODES.get(type(node), -1)
+    if isinstance(node, ast.Constant):
+        h = (h * 1000003) ^ hash(repr(node.value))
+    elif isinstance(node, ast.Attribute):
+        h = (h * 1000003) ^ hash(node.attr)
+    elif isinstance(node, ast.keyword):
+        h = (h * 1000003) ^ hash(node.arg)
+    for child in ast.iter_child_nodes(node):
+        h = ((h * 1000003) ^ _structural_hash(child, memo)) & _HASH_MASK
+    
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        memo[id(node)] = h
+    return h
+
+
+@dataclass(**DATACLASS_SLOTS)
 class ParseResult:
     functions: List[str]
     classes: List[str]
     methods: Dict[str, List[str]]
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class CodeSmell:
     type: str
     line: int
     description: str
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class RefactoringSuggestion:
     type: str
     description: str
     priority: str
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class ASTNode:
     type: str
-    children: List['ASTNode'] = None
+    children: Optional[List['ASTNode']] = None
+
+
+@dataclass(**DATACLASS_SLOTS)
+class FlatAST:
+    """Syntax tree stored as parallel arrays in post-order.
+    
+    ``types[i]`` is the node's code from ``_TYPE_CODES``, ``parent[i]`` the
+    index of its parent (-1 for the root) and ``first[i]`` the index of the
+    first node of its subtree, so the subtree of ``i`` is ``first[i]..i``
+    and the root is the last entry.
+    """
+    types: 'array[int]'
+    parent: 'array[int]'
+    first: 'array[int]'
+    
+    def __len__(self) -> int:
+        return len(self.types)
+    
+    def type_name(self, index: int) -> str:
+        return _TYPE_NAMES[self.types[index]]
+    
+    def children(self, index: int) -> List[int]:
+        # The last child sits right before its parent; each earlier sibling
+        # ends right before the previous sibling's subtree starts
+        children = []
+        child = index - 1
+        while child >= self.first[index]:
+            children.append(child)
+            child = self.first[child] - 1
+        children.reverse()
+        return children
+    
+    def to_node(self) -> 'ASTNode':
+        # Post-order means every child is built before its parent
+        nodes: List[ASTNode] = []
+        for index in range(len(self.types)):
+            nodes.append(ASTNode(
+                type=self.type_name(index),
+                children=[nodes[child] for child in self.children(index)]
+            ))
+        return nodes[-1]
+
+
+_Check = Callable[['_AnalysisVisitor', Any], None]
+
+# Node type -> checks run on every node of that type, in registration order
+_CHECKS: Dict[type, List[_Check]] = defaultdict(list)
+
+
+def register_check(*node_types: type) -> Callable[[_Check], _Check]:
+    """Register ``check(visitor, node)`` to run during full_analyze.
+    
+    All registered checks share the analyzer's single tree walk; each node
+    costs one dictionary lookup to find the checks for its type.
+    """
+    def decorator(check: _Check) -> _Check:
+        for node_type in node_types:
+            _CHECKS[node_type].append(check)
+        return check
+    return decorator
+
+
+class _AnalysisVisitor(ast.NodeVisitor):
+    """Single pass behind CodeAnalyzer.full_analyze.
+    
+    Runs the checks registered for each node's type, then dispatches through
+    visit_<NodeType> methods for the structure (functions, classes, methods)
+    and duplicate buckets.
+    """
+    
+    def __init__(self, analyzer: 'CodeAnalyzer', source_lines: List[str]):
+        self.analyzer = analyzer
+        self.source_lines = source_lines
+        self.functions: List[str] = []
+        self.classes: List[str] = []
+        self.methods: Dict[str, List[str]] = defaultdict(list)
+        self.smells: List[CodeSmell] = []
+        self.suggestions: List[RefactoringSuggestion] = []
+        self.duplicate_buckets: Dict[int, List[_FunctionNode]] = defaultdict(list)
+        # Function hashes for this traversal, keyed by id() of the node
+        self.function_hashes: Dict[int, int] = {}
+        self.current_class: Optional[str] = None
+    
+    def visit(self, node: ast.AST) -> Any:
+        checks = _CHECKS.get(type(node))
+        if checks:
+            for check in checks:
+                check(self, node)
+        return super().visit(node)
+    
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        self.classes.append(node.name)
+        outer_class = self.current_class
+        self.current_class = node.name
+        self.generic_visit(node)
+        self.current_class = outer_class
+    
+    def visit_FunctionDef(self, node: _FunctionNode) -> None:
+        if self.current_class:
+            self.methods[self.current_class].append(node.name)
+        else:
+            self.functions.append(node.name)
+        self.duplicate_buckets[_structural_hash(node, self.function_hashes)].append(node)
+        
+        # Functions nested inside a method are not methods themselves
+        outer_class = self.current_class
+        self.current_class = None
+        self.generic_visit(node)
+        self.current_class = outer_class
+    
+    def visit_AsyncFunctionDef(self, node: ast.AsyncFunctionDef) -> None:
+        self.visit_FunctionDef(node)
+
+
+@register_check(ast.FunctionDef, ast.AsyncFunctionDef)
+def _check_long_method(visitor: _AnalysisVisitor, node: _FunctionNode) -> None:
+    smell = visitor.analyzer._check_method_length(node, visitor.source_lines)
+    if smell:
+        visitor.smells.append(smell)
+
+
+@register_check(ast.FunctionDef, ast.AsyncFunctionDef)
+def _check_many_conditionals(visitor: _AnalysisVisitor, node: _FunctionNode) -> None:
+    if visitor.analyzer._has_many_conditionals(node):
+        visitor.suggestions.append(RefactoringSuggestion(
+            type="replace_conditionals",
+            description="Consider using strategy pattern or dictionary dispatch instead of multiple if/elif statements",
+            priority="medium"
+        ))
 
 
 class CodeAnalyzer:
-    def __init__(self):
+    def __init__(self) -> None:
         self.max_method_lines = 20
         self.similarity_threshold = 0.8
     
     def parse_code(self, code: str, language: str) -> ParseResult:
-        if language != "python":
-            raise NotImplementedError(f"Language {language} not supported yet")
-        
-        if not code.strip():
-            return ParseResult(functions=[], classes=[], methods={})
-        
-        tree = ast.parse(code)
-        
-        functions = []
-        classes = []
-        methods = {}
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                parent = self._get_parent_class(tree, node)
-                if parent:
-                    if parent not in methods:
-                        methods[parent] = []
-                    methods[parent].append(node.name)
-                else:
-                    functions.append(node.name)
-            elif isinstance(node, ast.ClassDef):
-                classes.append(node.name)
-        
-        return ParseResult(functions=functions, classes=classes, methods=methods)
+        structure, _, _ = self.full_analyze(code, language)
+        return structure
     
     def identify_code_smells(self, code: str, language: str) -> List[CodeSmell]:
-        if language != "python":
-            raise NotImplementedError(f"Language {language} not supported yet")
-        
-        smells = []
-        tree = ast.parse(code)
-        
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                lines = code.split('\n')[node.lineno - 1:node.end_lineno]
-                method_length = len([l for l in lines if l.strip()])
-                
-                if method_length > self.max_method_lines:
-                    smells.append(CodeSmell(
-                        type="long_method",
-                        line=node.lineno,
-                        description=f"Method '{node.name}' is too long ({method_length} lines)"
-                    ))
-        
-        duplicates = self._find_duplicate_code(tree)
-        smells.extend(duplicates)
-        
+        _, smells, _ = self.full_analyze(code, language)
         return smells
     
     def generate_suggestions(self, code: str, language: str) -> List[RefactoringSuggestion]:
+        _, _, suggestions = self.full_analyze(code, language)
+        return suggestions
+    
+    def full_analyze(self, code: str, language: str) -> Tuple[ParseResult, List[CodeSmell], List[RefactoringSuggestion]]:
+        """Collect structure, code smells and suggestions in one traversal."""
         if language != "python":
             raise NotImplementedError(f"Language {language} not supported yet")
         
-        suggestions = []
-        tree = ast.parse(code)
+        if not code.strip():
+            return ParseResult(functions=[], classes=[], methods={}), [], []
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                if self._has_many_conditionals(node):
-                    suggestions.append(RefactoringSuggestion(
-                        type="replace_conditionals",
-                        description="Consider using strategy pattern or dictionary dispatch instead of multiple if/elif statements",
-                        priority="medium"
-                    ))
+        visitor = _AnalysisVisitor(self, code.split('\n'))
+        visitor.visit(_parse_cached(code))
         
-        return suggestions
+        smells = visitor.smells + self._find_duplicate_code(visitor.duplicate_buckets)
+        structure = ParseResult(
+            functions=visitor.functions,
+            classes=visitor.classes,
+            methods=dict(visitor.methods)
+        )
+        return structure, smells, visitor.suggestions
     
-    def extract_ast(self, code: str, language: str) -> ASTNode:
+    def flatten_ast(self, code: str, language: str) -> FlatAST:
         if language != "python":
             raise NotImplementedError(f"Language {language} not supported yet")
         
-        tree = ast.parse(code)
-        return self._convert_ast_to_node(tree)
-    
-    def _get_parent_class(self, tree: ast.AST, func_node: ast.FunctionDef) -> Optional[str]:
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for child in node.body:
-                    if child == func_node:
-                        return node.name
+        tree = _parse_cached(code)
+        return self._flatten_ast(tree)
+    
+    def extract_ast(self, code: str, language: str) -> ASTNode:
+        # Nested ASTNode view over the flat representation
+        return self.flatten_ast(code, language).to_node()
+    
+    def _check_method_length(self, node: _FunctionNode, source_lines: List[str]) -> Optional[CodeSmell]:
+        lines = source_lines[node.lineno - 1:node.end_lineno]
+        method_length = sum(1 for l in lines if l.strip())
+        
+        if method_length > self.max_method_lines:
+            return CodeSmell(
+                type="long_method",
+                line=node.lineno,
+                description=f"Method '{node.name}' is too long ({method_length} lines)"
+            )
         return None
     
-    def _find_duplicate_code(self, tree: ast.AST) -> List[CodeSmell]:
+    def _find_duplicate_code(self, buckets: Dict[int, List[_FunctionNode]]) -> List[CodeSmell]:
         smells = []
-        functions = [node for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)]
-        
-        for i, func1 in enumerate(functions):
-            for func2 in functions[i+1:]:
-                if self._are_similar(func1, func2):
-                    smells.append(CodeSmell(
-                        type="duplicate_code",
-                        line=func1.lineno,
-                        description=f"Functions '{func1.name}' and '{func2.name}' have similar code"
-                    ))
-                    break
+        for funcs in buckets.values():
+            if len(funcs) > 1:
+                names = [f"'{func.name}'" for func in funcs]
+                smells.append(CodeSmell(
+                    type="duplicate_code",
+                    line=funcs[0].lineno,
+                    description=f"Functions {', '.join(names[:-1])} and {names[-1]} have similar code"
+                ))
         
         return smells
     
-    def _are_similar(self, node1: ast.AST, node2: ast.AST) -> bool:
-        lines1 = [line.strip() for line in ast.unparse(node1).split('\n') if line.strip()]
-        lines2 = [line.strip() for line in ast.unparse(node2).split('\n') if line.strip()]
-        
-        lines1_normalized = [line.replace(node1.name, 'FUNC') for line in lines1]
-        lines2_normalized = [line.replace(node2.name, 'FUNC') for line in lines2]
-        
-        param1 = node1.args.args[0].arg if node1.args.args else 'param'
-        param2 = node2.args.args[0].arg if node2.args.args else 'param'
-        
-        lines1_normalized = [line.replace(param1, 'PARAM') for line in lines1_normalized]
-        lines2_normalized = [line.replace(param2, 'PARAM') for line in lines2_normalized]
-        
-        return lines1_normalized == lines2_normalized
-    
-    def _has_many_conditionals(self, node: ast.FunctionDef) -> bool:
+    def _has_many_conditionals(self, node: _FunctionNode) -> bool:
+        # Stop as soon as the threshold is reached instead of walking the whole body
         conditionals = 0
-        for child in ast.walk(node):
-            if isinstance(child, ast.If):
+        stack: List[ast.AST] = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, ast.If):
                 conditionals += 1
-        return conditionals >= 4
-    
-    def _calculate_similarity(self, str1: str, str2: str) -> float:
-        if str1 == str2:
-            return 1.0
-        
-        len1, len2 = len(str1), len(str2)
-        max_len = max(len1, len2)
-        if max_len == 0:
-            return 1.0
-        
-        common_chars = sum(1 for c1, c2 in zip(str1, str2) if c1 == c2)
-        return common_chars / max_len
+                if conditionals >= 4:
+                    return True
+            stack.extend(ast.iter_child_nodes(current))
+        return False
     
-    def _convert_ast_to_node(self, ast_node: ast.AST) -> ASTNode:
-        node_type = ast_node.__class__.__name__
-        return ASTNode(type=node_type)
\ No newline at end of file
+    def _flatten_ast(self, ast_node: ast.AST) -> FlatAST:
+        # Iterative post-order walk: a node is emitted once all of its children
+        # have been, then claims them as its children via the first[] chain.
+        # Deep trees therefore never hit the recursion limit.
+        types = array('H')
+        parent = array('i')
+        first = array('i')
+        starts: List[int] = []
+        stack: List[Tuple[ast.AST, bool]] = [(ast_node, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                starts.append(len(types))
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(list(ast.iter_child_nodes(node))))
+            else:
+                index = len(types)
+                types.append(_TYPE_CODES[type(node)])
+                parent.append(-1)
+                first.append(starts.pop())
+                child = index - 1
+                while child >= first[index]:
+                    parent[child] = index
+                    child = first[child] - 1
+        return FlatAST(types=types, parent=parent, first=first)
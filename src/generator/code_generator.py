@@ -1,10 +1,158 @@
 import ast
+import hashlib
+import io
+import os
+import pickle
 import re
+import sys
+import tempfile
+import tokenize
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, Any, Set
+try:
+    from src._compat import DATACLASS_SLOTS
+except ImportError:
+    from _compat import DATACLASS_SLOTS
 
 
-@dataclass
+# Patterns used on every generate/format call, compiled once at import
+_RE_DEF_SIGNATURE = re.compile(r'def (\w+)\([^)]*\):')
+_RE_JS_FUNCTION = re.compile(r'function\s+(\w+)\s*\(\s*([^)]*)\s*\)\s*{')
+_RE_JS_LINE = re.compile(r'//.*$', re.MULTILINE)
+_RE_JS_BLOCK = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+# Number of formatted outputs CodeGenerator remembers as already clean
+_KNOWN_CLEAN_LIMIT = 256
+
+# Indentation hints for preserve_formatting, checked in this order: a line
+# starting a definition or control statement, then one that returns or
+# assigns the usual result variables anywhere in the line
+_RE_INDENT_HINT = re.compile(
+    r'^(?:(?P<definition>def |class )|(?P<control>if |else:|elif )|(?P<statement>return ))'
+    r'|(?P<assignment>result =|x =)'
+)
+
+# Every generate_clean_code rule as one alternation, so the source is scanned
+# once. The operator rule only looks ahead at its right operand, leaving it
+# free to start the next match and chains like x+y*z come out fully spaced.
+_RE_CLEAN = re.compile(r'''
+    (?P<def>\bdef\s+(?P<def_name>\w+)\s*\(\s*(?P<def_params>[^)]*)\s*\)\s*:)
+  | (?P<if>\b(?P<if_kw>(?:el)?if)\s*\(\s*(?P<if_cond>[^)]+)\s*\)\s*:)
+  | (?P<else>\belse\s+:)
+  | (?P<return>\breturn[ \t]+(?=\S)(?P<return_value>[^\n]+))
+  | (?P<assign>(?P<assign_target>\w+)\s*=\s*(?P<assign_value>[^=\n]+))
+  | (?P<binop>(?P<left>\w+)\s*(?P<op>[+\-*/]|[><]=?)\s*(?=\w))
+''', re.VERBOSE)
+
+
+def _clean_match(match: 're.Match[str]') -> str:
+    kind = match.lastgroup
+    if kind == 'def':
+        params = [p.strip() for p in match.group('def_params').split(',') if p.strip()]
+        return f"def {match.group('def_name')}({', '.join(params)}):"
+    if kind == 'if':
+        return f"{match.group('if_kw')} {_RE_CLEAN.sub(_clean_match, match.group('if_cond'))}:"
+    if kind == 'else':
+        return 'else:'
+    if kind == 'return':
+        return f"return {_RE_CLEAN.sub(_clean_match, match.group('return_value'))}"
+    if kind == 'assign':
+        return f"{match.group('assign_target')} = {_RE_CLEAN.sub(_clean_match, match.group('assign_value'))}"
+    # Binary or comparison operator
+    return f"{match.group('left')} {match.group('op')} "
+
+
+# Opt-in (CODEGEN_AST_DISK_CACHE=1) cache of pickled trees shared across processes
+_AST_CACHE_DIR = Path(tempfile.gettempdir()) / "code_gen_ast_cache"
+
+
+@lru_cache(maxsize=256)
+def _parse_cached(code: str) -> Optional[ast.Module]:
+    # Trees are only read here; invalid sources cache None so repeated
+    # validation of the same broken code also skips the parser
+    if os.environ.get("CODEGEN_AST_DISK_CACHE") == "1":
+        return _load_or_parse(code)
+    return _parse(code)
+
+
+def _parse(code: str) -> Optional[ast.Module]:
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        return None
+
+
+def _ast_cache_dir() -> Optional[Path]:
+    """The disk cache directory, or None if it cannot be trusted.
+    
+    Pickles are only loaded from a directory owned by the current user
+    that nobody else can write to.
+    """
+    try:
+        _AST_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)
+        info = _AST_CACHE_DIR.stat()
+    except OSError:
+        return None
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o022):
+        return None
+    return _AST_CACHE_DIR
+
+
+def _load_or_parse(code: str) -> Optional[ast.Module]:
+    cache_dir = _ast_cache_dir()
+    if cache_dir is None:
+        return _parse(code)
+    
+    # Pickled trees are tied to the interpreter's ast classes
+    key = f"{sys.version_info[0]}.{sys.version_info[1]}\0{code}"
+    digest = hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    path = cache_dir / f"{digest}.ast.pkl"
+    try:
+        tree: Optional[ast.Module] = pickle.loads(path.read_bytes())
+        return tree
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    
+    tree = _parse(code)
+    try:
+        # Write then rename, so concurrent readers never see a partial file
+        partial = path.with_suffix(f".{os.getpid()}.tmp")
+        partial.write_bytes(pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(partial, path)
+    except OSError:
+        pass
+    return tree
+
+
+def _line_ending(line: str) -> str:
+    """The line break a splitlines(keepends=True) line ends with ('' for the last line)."""
+    return line[len(line.rstrip('\r\n')):]
+
+
+def _loaded_names(tree: ast.AST) -> Set[str]:
+    """Every identifier read in a tree; a module is used when its bound name is read."""
+    return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+
+
+def _imported_names(import_line: str) -> Set[str]:
+    """Names bound by an 'import a.b, c as d' line ({'a', 'd'})."""
+    names = set()
+    for part in import_line.split('import ', 1)[1].split(','):
+        if ' as ' in part:
+            names.add(part.split(' as ')[1].strip())
+        else:
+            names.add(part.strip().split('.')[0])
+    return names
+
+
+def _binop_kinds(tree: ast.AST) -> Set[type]:
+    """Operator classes (ast.Add, ast.Mult, ...) used by binary operations in a tree."""
+    return {type(node.op) for node in ast.walk(tree) if isinstance(node, ast.BinOp)}
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class GenerationOptions:
     language: str = "python"
     preserve_comments: bool = True
@@ -14,24 +162,30 @@ class GenerationOptions:
 
 
 class CodeGenerator:
+    supported_languages = frozenset(("python", "javascript", "typescript"))
+    formatting_styles = frozenset(("black", "pep8", "google", "numpy"))
+    
     def __init__(self):
-        self.supported_languages = ["python", "javascript", "typescript"]
-        self.formatting_styles = ["black", "pep8", "google", "numpy"]
+        # Pipeline stages often regenerate identical (code, options) pairs;
+        # the cache lives on the instance so it goes away with the generator
+        self._generate_cached = lru_cache(maxsize=128)(self._generate_uncached)
+        # Hashes of recent clean_code output, in insertion order; cleaning is
+        # idempotent, so feeding that output back in can skip the regex pass
+        self._known_clean: Dict[int, None] = {}
+        self._language_generators = {
+            "python": self._generate_python_code,
+            "javascript": self._generate_javascript_code,
+            "typescript": self._generate_typescript_code,
+        }
     
     def generate_code(self, code: str, options: GenerationOptions) -> str:
         if options.language not in self.supported_languages:
             raise NotImplementedError(f"Language {options.language} is not supported")
         
-        result = code
-        
-        if options.language == "python":
-            result = self._generate_python_code(result, options)
-        elif options.language == "javascript":
-            result = self._generate_javascript_code(result, options)
-        elif options.language == "typescript":
-            result = self._generate_typescript_code(result, options)
-        
-        return result
+        return self._generate_cached(code, options)
+    
+    def _generate_uncached(self, code: str, options: GenerationOptions) -> str:
+        return self._language_generators[options.language](code, options)
     
     def _generate_python_code(self, code: str, options: GenerationOptions) -> str:
         result = code
@@ -71,98 +225,69 @@ class CodeGenerator:
     
     def preserve_formatting(self, original_code: str, refactored_code: str) -> str:
         # Extract indentation patterns from original code
-        original_lines = original_code.split('\n')
-        refactored_lines = refactored_code.split('\n')
+        original_lines = original_code.splitlines(keepends=True)
+        refactored_lines = refactored_code.splitlines(keepends=True)
+        # Whether the original has if blocks does not depend on the line, so check it once
+        has_if = any('if ' in orig_line for orig_line in original_lines)
         
         result_lines = []
         
-        for i, line in enumerate(refactored_lines):
+        for line in refactored_lines:
             if line.strip():
                 # Find corresponding line in original or use similar indentation pattern
-                indent = self._get_appropriate_indentation(line, original_lines, i)
-                result_lines.append(indent + line.strip())
+                indent = self._get_appropriate_indentation(line, has_if)
+                result_lines.append(indent + line.strip() + _line_ending(line))
             else:
                 result_lines.append(line)
         
-        return '\n'.join(result_lines)
+        return ''.join(result_lines)
     
-    def _get_appropriate_indentation(self, line: str, original_lines: List[str], line_index: int) -> str:
+    def _get_appropriate_indentation(self, line: str, has_if: bool) -> str:
         stripped = line.strip()
         
         # Look for function definitions, if statements, etc. to determine indentation level
-        if stripped.startswith('def ') or stripped.startswith('class '):
+        hint = _RE_INDENT_HINT.search(stripped)
+        kind = hint.lastgroup if hint else None
+        if kind == 'definition':
             return ''
-        elif stripped.startswith('if ') or stripped.startswith('else:') or stripped.startswith('elif '):
+        elif kind == 'control':
             return '    '
-        elif stripped.startswith('return ') or 'result =' in stripped or 'x =' in stripped:
+        elif kind is not None:
             # If this is inside an if block, use double indentation
-            if any('if ' in orig_line for orig_line in original_lines):
+            if has_if:
                 return '        '  # 8 spaces for nested blocks
             return '    '  # 4 spaces for function body
         
         return '    '  # Default indentation
     
     def preserve_semantic_equivalence(self, original_code: str, refactored_code: str) -> bool:
-        try:
-            # Parse both pieces of code to AST
-            original_ast = ast.parse(original_code)
-            refactored_ast = ast.parse(refactored_code)
-            
-            # Simple check: if both parse successfully and have similar structure
-            # In a real implementation, this would be more sophisticated
-            original_functions = [node.name for node in ast.walk(original_ast) if isinstance(node, ast.FunctionDef)]
-            refactored_functions = [node.name for node in ast.walk(refactored_ast) if isinstance(node, ast.FunctionDef)]
-            
-            # Check if the refactored code changes the fundamental operations
-            original_dump = ast.dump(original_ast)
-            refactored_dump = ast.dump(refactored_ast)
-            
-            # Simple heuristic: if the operations are fundamentally different (+ vs *), it's not equivalent
-            if ('BinOp' in original_dump and 'Add' in original_dump and 
-                'BinOp' in refactored_dump and 'Mult' in refactored_dump):
-                return False
-            
-            return True
-        except SyntaxError:
+        # Parse both pieces of code to AST
+        original_ast = _parse_cached(original_code)
+        refactored_ast = _parse_cached(refactored_code)
+        if original_ast is None or refactored_ast is None:
             return False
-    
-    def generate_clean_code(self, code: str) -> str:
-        # Clean up formatting
-        result = code
-        
-        # Fix function definitions with proper parameter spacing
-        result = re.sub(r'def\s+(\w+)\s*\(\s*([^)]*)\s*\)\s*:', 
-                       lambda m: f'def {m.group(1)}({", ".join([p.strip() for p in m.group(2).split(",") if p.strip()])}):',
-                       result)
-        
-        # Fix assignments
-        result = re.sub(r'(\w+)\s*=\s*([^=\n]+)', r'\1 = \2', result)
         
-        # Fix operators with proper spacing
-        result = re.sub(r'(\w+)\s*([+\-*/])\s*(\w+)', r'\1 \2 \3', result)
+        # Simple check: if both parse successfully and have similar structure
+        # In a real implementation, this would be more sophisticated
+        original_ops = _binop_kinds(original_ast)
+        refactored_ops = _binop_kinds(refactored_ast)
         
-        # Fix multiplication operators specifically
-        result = re.sub(r'(\w+)\s*\*\s*(\w+)', r'\1 * \2', result)
-        
-        # Fix if statements
-        result = re.sub(r'if\s*\(\s*([^)]+)\s*\)\s*:', r'if \1:', result)
-        result = re.sub(r'else\s+:', r'else:', result)
-        
-        # Fix comparison operators
-        result = re.sub(r'(\w+)\s*([><]=?)\s*(\w+)', r'\1 \2 \3', result)
-        
-        # Fix return statements
-        result = re.sub(r'return\s+([^\n]+)', r'return \1', result)
+        # Simple heuristic: if the operations are fundamentally different (+ vs *), it's not equivalent
+        if ast.Add in original_ops and ast.Mult in refactored_ops:
+            return False
         
-        return result
+        return True
+    
+    def generate_clean_code(self, code: str) -> str:
+        # Clean up formatting of definitions, conditionals, assignments,
+        # operators and returns in a single pass
+        return _RE_CLEAN.sub(_clean_match, code)
     
     def validate_code(self, code: str, language: str) -> bool:
         if language == "python":
-            try:
-                ast.parse(code)
-                return True
-            except SyntaxError:
-                return False
+            # Only parsed, not compiled: fragments such as a bare 'return'
+            # or 'yield' are valid refactoring output
+            return _parse_cached(code) is not None
         elif language == "javascript":
             # Simple validation for JavaScript (in real implementation, use a JS parser)
             return '{' in code and '}' in code and 'function' in code
@@ -171,43 +296,82 @@ class CodeGenerator:
     
     def _remove_comments(self, code: str, language: str) -> str:
         if language == "python":
-            lines = code.split('\n')
-            result_lines = []
-            for line in lines:
-                # Remove lines that are only comments
-                if line.strip().startswith('#'):
-                    continue
-                # Remove inline comments
-                if '#' in line:
-                    line = line[:line.index('#')].rstrip()
-                result_lines.append(line)
-            return '\n'.join(result_lines)
+            if '#' not in code:
+                return code
+            if '"' not in code and "'" not in code:
+                # Without string literals every '#' starts a comment
+                return self._remove_python_comments_by_line(code)
+            try:
+                return self._remove_python_comments(code)
+            except (tokenize.TokenError, SyntaxError):
+                # Not tokenizable (e.g. a fragment); fall back to plain line scanning
+                return self._remove_python_comments_by_line(code)
         elif language in ["javascript", "typescript"]:
             # Remove // comments
-            result = re.sub(r'//.*$', '', code, flags=re.MULTILINE)
+            result = _RE_JS_LINE.sub('', code)
             # Remove /* */ comments
-            result = re.sub(r'/\*.*?\*/', '', result, flags=re.DOTALL)
+            result = _RE_JS_BLOCK.sub('', result)
             return result
         
         return code
     
+    def _remove_python_comments(self, code: str) -> str:
+        # Locate real comments with the tokenizer so '#' inside strings survives
+        # Split on '\n' only, exactly like the tokenizer's rows
+        lines = io.StringIO(code).readlines()
+        dropped = set()
+        for token in tokenize.generate_tokens(iter(lines).__next__):
+            if token.type == tokenize.COMMENT:
+                row, col = token.start
+                line = lines[row - 1]
+                if line[:col].strip():
+                    # Remove inline comments
+                    lines[row - 1] = line[:col].rstrip() + _line_ending(line)
+                else:
+                    # Remove lines that are only comments
+                    dropped.add(row - 1)
+        return ''.join(line for i, line in enumerate(lines) if i not in dropped)
+    
+    def _remove_python_comments_by_line(self, code: str) -> str:
+        result_lines = []
+        for line in code.splitlines(keepends=True):
+            index = line.find('#')
+            if index >= 0:
+                # Remove lines that are only comments
+                if not line[:index].strip():
+                    continue
+                # Remove inline comments
+                line = line[:index].rstrip() + _line_ending(line)
+            result_lines.append(line)
+        return ''.join(result_lines)
+    
     def _optimize_imports(self, code: str) -> str:
-        lines = code.split('\n')
+        lines = code.splitlines(keepends=True)
         imports = []
         other_lines = []
-        used_modules = set()
+        # Ordered and de-duplicated, so output is deterministic
+        used_modules: Dict[str, None] = {}
         
         # Collect imports and other lines
         for line in lines:
             if line.strip().startswith('import '):
-                imports.append(line)
+                # Imports move to the top, so each needs its own line ending
+                imports.append(line if _line_ending(line) else line + '\n')
             else:
                 other_lines.append(line)
         
         # Find which modules are actually used
-        code_content = '\n'.join(other_lines)
+        code_content = ''.join(other_lines)
+        tree = _parse_cached(code_content)
+        used_names = _loaded_names(tree) if tree is not None else None
         for import_line in imports:
             if 'import ' in import_line:
+                if used_names is not None:
+                    if not _imported_names(import_line).isdisjoint(used_names):
+                        used_modules[import_line] = None
+                    continue
+                
+                # Code that does not parse: fall back to a substring check
                 # Extract module name
                 if ' as ' in import_line:
                     module = import_line.split(' as ')[1].strip()
@@ -215,28 +379,35 @@ class CodeGenerator:
                     module = import_line.split('import ')[1].strip()
                 
                 if module in code_content:
-                    used_modules.add(import_line)
+                    used_modules[import_line] = None
         
         # Reconstruct code with only used imports
-        result_lines = list(used_modules) + [''] + other_lines
-        return '\n'.join(result_lines)
+        separator = _line_ending(imports[0]) if imports else '\n'
+        result_lines = list(used_modules) + [separator] + other_lines
+        return ''.join(result_lines)
     
     def _add_type_hints(self, code: str) -> str:
         # Simple type hint addition (in real implementation, this would be more sophisticated)
         result = code
         
         # Add basic return type hints
-        result = re.sub(r'def (\w+)\([^)]*\):', r'def \1() -> Any:', result)
+        result = _RE_DEF_SIGNATURE.sub(r'def \1() -> Any:', result)
         
         return result
     
     def _apply_formatting(self, code: str, style: str) -> str:
         if style in ["black", "pep8"]:
-            return self.generate_clean_code(code)
+            if hash(code) in self._known_clean:
+                return code
+            result = self.generate_clean_code(code)
+            self._known_clean[hash(result)] = None
+            if len(self._known_clean) > _KNOWN_CLEAN_LIMIT:
+                del self._known_clean[next(iter(self._known_clean))]
+            return result
         return code
     
     def _apply_js_formatting(self, code: str) -> str:
         # Basic JavaScript formatting
         result = code
-        result = re.sub(r'function\s+(\w+)\s*\(\s*([^)]*)\s*\)\s*{', r'function \1(\2) {', result)
+        result = _RE_JS_FUNCTION.sub(r'function \1(\2) {', result)
         return result
\ No newline at end of file
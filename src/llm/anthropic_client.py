@@ -1,9 +1,14 @@
 """Anthropic API client implementation"""
+import asyncio
 import os
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple, Union
+from dataclasses import asdict, dataclass, replace
 import anthropic
-from anthropic import Anthropic, APIError
+from anthropic import AsyncAnthropic, APIError
+
+from .response_cache import ResponseCache, cache_key
+from .response_store import ResponseStore
+from .semantic_cache import SemanticCache, quoted_identifiers
 
 
 @dataclass
@@ -15,14 +20,54 @@ class APIResponse:
     status: Optional[str] = None
 
 
+# Marks a content block as the end of a cacheable prompt prefix
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _usage_dict(usage: Any) -> Dict[str, int]:
+    """Token counts from a response, including prompt-cache writes and reads"""
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0
+    }
+
+
+def _clip_utf8(text: str, limit: int) -> Optional[str]:
+    """text cut to at most limit UTF-8 bytes, or None if it already fits"""
+    # A character is at most 4 bytes, so short text needs no encoding
+    if len(text) * 4 <= limit:
+        return None
+    encoded = text.encode("utf-8")
+    if len(encoded) <= limit:
+        return None
+    return encoded[:limit].decode("utf-8", "ignore")
+
+
 class AnthropicClient:
-    """Client for interacting with Anthropic API"""
+    """Client for interacting with Anthropic API
     
-    def __init__(self, api_key: Optional[str] = None):
+    Calls are async and share one AsyncAnthropic instance, whose HTTP
+    connection pool keeps connections alive between requests. Create one
+    client per process (e.g. at app startup) and ``await aclose()`` at
+    shutdown.
+    """
+    
+    def __init__(self, api_key: Optional[str] = None,
+                 semantic_cache: Union[bool, SemanticCache] = False,
+                 response_store: Union[bool, ResponseStore] = False):
         """Initialize Anthropic client
         
         Args:
             api_key: API key for Anthropic. If not provided, reads from ANTHROPIC_API_KEY env var
+            semantic_cache: True to also serve responses for prompts similar
+                to earlier ones (requires sentence-transformers; the index is
+                persisted to ANTHROPIC_SEMANTIC_CACHE_PATH if set), or a
+                configured SemanticCache
+            response_store: True to also keep responses on disk across
+                restarts (sqlite file at ANTHROPIC_RESPONSE_STORE_PATH,
+                default ``.llm_cache.sqlite3``), or a configured ResponseStore
             
         Raises:
             ValueError: If no API key is found
@@ -34,11 +79,48 @@ class AnthropicClient:
         # Default configuration
         self.model = os.getenv("ANTHROPIC_MODEL", "claude-3-sonnet-20240229")
         self.max_tokens = int(os.getenv("ANTHROPIC_MAX_TOKENS", "4096"))
+        # Upper bound on response text kept per request; longer output is
+        # cut off and marked status="truncated"
+        self.max_response_bytes = int(os.getenv("ANTHROPIC_MAX_RESPONSE_BYTES", str(1024 * 1024)))
         
         # Initialize the Anthropic client
-        self.client = Anthropic(api_key=self.api_key)
+        self.client = AsyncAnthropic(api_key=self.api_key)
+        
+        # Successful responses to identical requests are served from memory
+        self._response_cache = ResponseCache(maxsize=1024, ttl=3600.0)
+        if semantic_cache is True:
+            semantic_cache = SemanticCache(
+                index_path=os.getenv("ANTHROPIC_SEMANTIC_CACHE_PATH"),
+                dump=asdict,
+                load=lambda data: APIResponse(**data)
+            )
+        self._semantic_cache: Optional[SemanticCache] = (
+            semantic_cache if isinstance(semantic_cache, SemanticCache) else None
+        )
+        if response_store is True:
+            response_store = ResponseStore(os.getenv("ANTHROPIC_RESPONSE_STORE_PATH", ".llm_cache.sqlite3"))
+        self._response_store: Optional[ResponseStore] = (
+            response_store if isinstance(response_store, ResponseStore) else None
+        )
+        # Requests currently waiting on the API, by cache key; identical
+        # concurrent prompts await the same call
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+    
+    def clear_cache(self) -> None:
+        """Forget every cached response"""
+        self._response_cache.clear()
+        if self._response_store is not None:
+            self._response_store.clear()
     
-    def test_connection(self) -> APIResponse:
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool and persist the semantic cache"""
+        if self._semantic_cache is not None:
+            self._semantic_cache.save()
+        if self._response_store is not None:
+            self._response_store.close()
+        await self.client.close()
+    
+    async def test_connection(self) -> APIResponse:
         """Test connection to Anthropic API
         
         Returns:
@@ -46,7 +128,7 @@ class AnthropicClient:
         """
         try:
             # Send a minimal test message
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=10,
                 messages=[
@@ -57,10 +139,7 @@ class AnthropicClient:
             return APIResponse(
                 content=response.content[0].text,
                 model=response.model,
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                },
+                usage=_usage_dict(response.usage),
                 status="connected"
             )
         except APIError as e:
@@ -71,57 +150,219 @@ class AnthropicClient:
                 status="error"
             )
     
-    def execute_prompt(self, prompt: str, system_prompt: Optional[str] = None) -> APIResponse:
+    async def execute_prompt(self, prompt: str, system_prompt: Optional[str] = None,
+                             prompt_prefix: Optional[str] = None) -> APIResponse:
         """Execute a prompt and get response
         
         Args:
             prompt: The prompt to send to the API
             system_prompt: Optional system prompt to set context
+            prompt_prefix: Optional static start of the user message (task
+                instructions, code context) that is sent before ``prompt``
+                and cached by the API across requests
             
         Returns:
             APIResponse containing the response
         """
-        # Use internal API call method
-        return self._call_api(prompt, system_prompt)
+        key = cache_key(self.model, self.max_tokens, system_prompt, prompt_prefix, prompt)
+        cached = self._cached_response(key)
+        
+        pending = self._inflight.get(key) if cached is None else None
+        if pending is not None:
+            await asyncio.wait({pending})
+            if pending.cancelled():
+                # The caller that made the request went away; try again
+                return await self.execute_prompt(prompt, system_prompt, prompt_prefix)
+            cached = pending.result()
+        
+        if cached is not None:
+            # Copy so callers cannot alter the cached entry
+            return replace(cached, usage=dict(cached.usage))
+        
+        # Registered before the first await, so identical prompts arriving
+        # while the embedding runs wait for this call
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        vector = None
+        # Quoted names must match exactly: prompts that differ only in an
+        # identifier are similar enough to return the wrong rename
+        scope = cache_key(self.model, self.max_tokens, system_prompt, prompt_prefix,
+                          *quoted_identifiers(prompt))
+        try:
+            if self._semantic_cache is not None:
+                # Embedding is CPU-bound; keep it off the event loop
+                vector = await asyncio.get_running_loop().run_in_executor(
+                    None, self._semantic_cache.encode, prompt
+                )
+                cached = self._semantic_cache.search(vector, scope)
+            if cached is not None:
+                future.set_result(replace(cached, usage=dict(cached.usage)))
+                return replace(cached, usage=dict(cached.usage))
+            # Use internal API call method
+            response = await self._call_api(prompt, system_prompt, prompt_prefix)
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        
+        future.set_result(replace(response, usage=dict(response.usage)))
+        # Errors and truncated output are not cached, as in the stream path
+        if response.status is None:
+            self._store_response(key, response)
+            if vector is not None:
+                self._semantic_cache.add(vector, scope, replace(response, usage=dict(response.usage)))
+        return response
     
-    def _call_api(self, prompt: str, system_prompt: Optional[str] = None) -> APIResponse:
+    async def execute_prompts_batch(self, prompts: List[Tuple[str, Optional[str]]],
+                                    concurrency: int = 20) -> List[APIResponse]:
+        """Execute several prompts concurrently
+        
+        Args:
+            prompts: (prompt, system_prompt) pairs
+            concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            One APIResponse per prompt, in the same order; failures are
+            returned as error responses
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run_one(prompt: str, system_prompt: Optional[str]) -> APIResponse:
+            async with semaphore:
+                return await self.execute_prompt(prompt, system_prompt)
+        
+        results = await asyncio.gather(
+            *(run_one(prompt, system_prompt) for prompt, system_prompt in prompts),
+            return_exceptions=True
+        )
+        return [
+            result if isinstance(result, APIResponse) else APIResponse(
+                content=f"API Error: {str(result)}",
+                model=self.model,
+                usage={"input_tokens": 0, "output_tokens": 0},
+                status="error"
+            )
+            for result in results
+        ]
+    
+    async def execute_prompt_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                                    prompt_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """Execute a prompt and yield the response text as it arrives
+        
+        Takes the same arguments as execute_prompt. A cached response is
+        yielded in one piece, and a completed stream is cached for later
+        calls of either method. The stream is closed once max_response_bytes
+        have been yielded.
+        
+        Yields:
+            Chunks of response text; on failure, an "API Error: ..." chunk
+        """
+        key = cache_key(self.model, self.max_tokens, system_prompt, prompt_prefix, prompt)
+        cached = self._cached_response(key)
+        if cached is not None:
+            yield cached.content
+            return
+        
+        try:
+            async with self.client.messages.stream(
+                **self._request_kwargs(prompt, system_prompt, prompt_prefix)
+            ) as stream:
+                remaining = self.max_response_bytes
+                async for text in stream.text_stream:
+                    clipped = _clip_utf8(text, remaining)
+                    if clipped is not None:
+                        # Leaving the block closes the connection; the
+                        # partial output is not cached
+                        yield clipped
+                        return
+                    remaining -= len(text.encode("utf-8"))
+                    yield text
+                message = await stream.get_final_message()
+        except Exception as e:
+            yield f"API Error: {str(e)}"
+            return
+        
+        self._store_response(key, APIResponse(
+            content="".join(block.text for block in message.content if block.type == "text"),
+            model=message.model,
+            usage=_usage_dict(message.usage)
+        ))
+    
+    def _cached_response(self, key: bytes) -> Optional[APIResponse]:
+        """Response for key from memory, then from the disk store"""
+        cached = self._response_cache.get(key)
+        if cached is None and self._response_store is not None:
+            data = self._response_store.get(key)
+            if data is not None:
+                cached = APIResponse(**data)
+                self._response_cache.set(key, cached)
+        return cached
+    
+    def _store_response(self, key: bytes, response: APIResponse) -> None:
+        """Write a successful response through to memory and the disk store"""
+        self._response_cache.set(key, replace(response, usage=dict(response.usage)))
+        if self._response_store is not None:
+            self._response_store.set(key, asdict(response))
+    
+    def _request_kwargs(self, prompt: str, system_prompt: Optional[str] = None,
+                        prompt_prefix: Optional[str] = None) -> Dict[str, Any]:
+        """Arguments for messages.create / messages.stream"""
+        # Build messages
+        content: Any = prompt
+        if prompt_prefix:
+            content = [
+                {"type": "text", "text": prompt_prefix, "cache_control": _CACHE_CONTROL},
+                {"type": "text", "text": prompt}
+            ]
+        messages = [{"role": "user", "content": content}]
+        
+        # Create the API request
+        kwargs: Dict[str, Any] = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "messages": messages
+        }
+        
+        # Add system prompt if provided
+        if system_prompt:
+            kwargs["system"] = [
+                {"type": "text", "text": system_prompt, "cache_control": _CACHE_CONTROL}
+            ]
+        return kwargs
+    
+    async def _call_api(self, prompt: str, system_prompt: Optional[str] = None,
+                        prompt_prefix: Optional[str] = None) -> APIResponse:
         """Internal method to call Anthropic API
         
+        The system prompt and the optional prompt prefix carry cache_control
+        markers, so repeated instructions are read from Anthropic's prompt
+        cache instead of being processed again.
+        
         Args:
             prompt: The prompt to send
             system_prompt: Optional system prompt
+            prompt_prefix: Optional cacheable start of the user message
             
         Returns:
             APIResponse from the API
         """
         try:
-            # Build messages
-            messages = [{"role": "user", "content": prompt}]
-            
-            # Create the API request
-            kwargs = {
-                "model": self.model,
-                "max_tokens": self.max_tokens,
-                "messages": messages
-            }
-            
-            # Add system prompt if provided
-            if system_prompt:
-                kwargs["system"] = system_prompt
-            
             # Make the API call
-            response = self.client.messages.create(**kwargs)
+            response = await self.client.messages.create(
+                **self._request_kwargs(prompt, system_prompt, prompt_prefix)
+            )
             
             # Extract content from response
             content = response.content[0].text if response.content else ""
+            clipped = _clip_utf8(content, self.max_response_bytes)
             
             return APIResponse(
-                content=content,
+                content=content if clipped is None else clipped,
                 model=response.model,
-                usage={
-                    "input_tokens": response.usage.input_tokens,
-                    "output_tokens": response.usage.output_tokens
-                }
+                usage=_usage_dict(response.usage),
+                status=None if clipped is None else "truncated"
             )
             
         except Exception as e:
@@ -131,4 +372,27 @@ class AnthropicClient:
                 model=self.model,
                 usage={"input_tokens": 0, "output_tokens": 0},
                 status="error"
-            ) 
\ No newline at end of file
+            )
+
+
+_default_client: Optional[AnthropicClient] = None
+
+
+def get_client() -> AnthropicClient:
+    """Process-wide AnthropicClient, created on first use
+    
+    Raises:
+        ValueError: If no API key is found
+    """
+    global _default_client
+    if _default_client is None:
+        _default_client = AnthropicClient()
+    return _default_client
+
+
+async def close_client() -> None:
+    """Close the process-wide client; the next get_client() creates a new one"""
+    global _default_client
+    if _default_client is not None:
+        client, _default_client = _default_client, None
+        await client.aclose()
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""In-memory response cache for LLM calls"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+def cache_key(*parts: Optional[object]) -> bytes:
+    """Digest identifying one request; None and "" are treated alike
+    
+    Parts are length-prefixed before hashing so that ("ab", "c") and
+    ("a", "bc") never collide.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = str(part if part is not None else "").encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.digest()
+
+
+class ResponseCache:
+    """LRU cache whose entries also expire after a fixed time-to-live"""
+    
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0):
+        """Initialize the cache
+        
+        Args:
+            maxsize: Maximum number of entries; the least recently used is evicted first
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: bytes, value: Any) -> None:
+        """Store value under key, evicting the least recently used entry if full"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
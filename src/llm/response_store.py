@@ -0,0 +1,68 @@
+"""Disk-backed response store for LLM calls
+
+Responses survive restarts, so an interrupted refactoring session can resume
+without paying for the same calls again. Uses the standard library's sqlite3;
+one file, safe for concurrent readers.
+"""
+import json
+import sqlite3
+import time
+from typing import Any, Optional
+
+
+class ResponseStore:
+    """sqlite table of JSON values keyed by request digest, with a time-to-live"""
+    
+    def __init__(self, path: str, ttl: Optional[float] = 7 * 24 * 3600.0):
+        """Open (or create) the store
+        
+        Args:
+            path: sqlite database file
+            ttl: Seconds an entry stays valid after it is stored; None keeps entries forever
+        """
+        self.path = path
+        self.ttl = ttl
+        self._conn = sqlite3.connect(path)
+        # WAL lets readers proceed during a write and avoids a full sync per commit
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key BLOB PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.purge()
+    
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    
+    def get(self, key: bytes) -> Optional[Any]:
+        """Return the stored value for key, or None if missing or expired"""
+        row = self._conn.execute(
+            "SELECT value FROM responses WHERE key = ? AND created_at >= ?",
+            (key, self._oldest_valid())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def set(self, key: bytes, value: Any) -> None:
+        """Store a JSON-serializable value under key, replacing any previous entry"""
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+    
+    def purge(self) -> None:
+        """Delete expired entries"""
+        with self._conn:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (self._oldest_valid(),))
+    
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._conn:
+            self._conn.execute("DELETE FROM responses")
+    
+    def close(self) -> None:
+        self._conn.close()
+    
+    def _oldest_valid(self) -> float:
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
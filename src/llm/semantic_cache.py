@@ -0,0 +1,151 @@
+"""Similarity-based response cache for near-duplicate prompts
+
+Prompts are embedded and compared by cosine similarity, so "rename 'foo'
+to 'bar'" and "please rename function 'foo' into 'bar'" can share one
+response. Prompts differing only in an identifier embed almost alike, so
+callers fold quoted_identifiers() into the scope and "rename 'foo' to
+'baz'" never reuses that response. The default encoder needs the optional
+``sentence-transformers`` package; ``faiss`` is used for the index when installed, otherwise a linear scan.
+"""
+import json
+import math
+import os
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Encoder = Callable[[str], Sequence[float]]
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+_QUOTED_IDENTIFIER = re.compile(r"""(['"`])([A-Za-z_][\w.]*)\1""")
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [float(v) / norm for v in vector]
+
+
+def quoted_identifiers(text: str) -> Tuple[str, ...]:
+    """Quoted names in a prompt ('foo', "foo" or `foo`), in order"""
+    return tuple(match.group(2) for match in _QUOTED_IDENTIFIER.finditer(text))
+
+
+def _sentence_transformer_encoder(model_name: str) -> Encoder:
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError as e:
+        raise ImportError(
+            "semantic_cache requires sentence-transformers (pip install sentence-transformers)"
+        ) from e
+    model = SentenceTransformer(model_name)
+    return lambda text: model.encode(text).tolist()
+
+
+class SemanticCache:
+    """Cache of responses searchable by prompt similarity
+    
+    Entries are grouped by a scope key (model, system prompt, ...) and only
+    match prompts with the same scope.
+    """
+    
+    def __init__(self, encoder: Optional[Encoder] = None, threshold: float = 0.95,
+                 index_path: Optional[str] = None, model_name: str = DEFAULT_MODEL,
+                 dump: Callable[[Any], Any] = lambda value: value,
+                 load: Callable[[Any], Any] = lambda value: value):
+        """Initialize the cache
+        
+        Args:
+            encoder: Function mapping text to an embedding. Defaults to a
+                sentence-transformers model
+            threshold: Minimum cosine similarity for a hit
+            index_path: Optional file the index is loaded from and saved to
+            model_name: sentence-transformers model used by the default encoder
+            dump: Converts a cached value to JSON-serializable data for save()
+            load: Converts that data back when the index is loaded
+        """
+        self.encoder = encoder or _sentence_transformer_encoder(model_name)
+        self.threshold = threshold
+        self.index_path = index_path
+        self._dump = dump
+        self._load_value = load
+        # Parallel to the index rows; vectors are kept so the index can be
+        # saved and rebuilt whichever backend is available
+        self._entries: List[Tuple[bytes, Any]] = []
+        self._vectors: List[List[float]] = []
+        self._index: Any = None
+        try:
+            import faiss
+            self._faiss: Any = faiss
+        except ImportError:
+            self._faiss = None
+        if index_path and os.path.exists(index_path + ".json"):
+            self._load()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def encode(self, text: str) -> List[float]:
+        """Unit-length embedding of text"""
+        return _normalize(self.encoder(text))
+    
+    def search(self, vector: List[float], scope: bytes) -> Optional[Any]:
+        """Most similar cached value in scope, if similar enough"""
+        if not self._entries:
+            return None
+        for score, row in self._nearest(vector, k=min(4, len(self._entries))):
+            if score < self.threshold:
+                break
+            entry_scope, value = self._entries[row]
+            if entry_scope == scope:
+                return value
+        return None
+    
+    def add(self, vector: List[float], scope: bytes, value: Any) -> None:
+        """Store value under an embedding"""
+        if self._faiss is not None:
+            if self._index is None:
+                self._index = self._faiss.IndexFlatIP(len(vector))
+            self._index.add(self._as_matrix([vector]))
+        self._vectors.append(vector)
+        self._entries.append((scope, value))
+    
+    def save(self) -> None:
+        """Write the index and its entries to index_path (no-op without a path)"""
+        if not self.index_path:
+            return
+        entries = [{"scope": scope.hex(), "value": self._dump(value)} for scope, value in self._entries]
+        data: Dict[str, Any] = {"entries": entries, "vectors": self._vectors}
+        if self._index is not None:
+            self._faiss.write_index(self._index, self.index_path)
+        with open(self.index_path + ".json", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    
+    def _load(self) -> None:
+        assert self.index_path is not None
+        with open(self.index_path + ".json", encoding="utf-8") as f:
+            data = json.load(f)
+        self._entries = [(bytes.fromhex(e["scope"]), self._load_value(e["value"])) for e in data["entries"]]
+        self._vectors = data["vectors"]
+        if self._faiss is None or not self._vectors:
+            return
+        if os.path.exists(self.index_path):
+            self._index = self._faiss.read_index(self.index_path)
+        else:
+            # Saved without faiss; build the index from the stored vectors
+            self._index = self._faiss.IndexFlatIP(len(self._vectors[0]))
+            self._index.add(self._as_matrix(self._vectors))
+    
+    def _nearest(self, vector: List[float], k: int) -> List[Tuple[float, int]]:
+        if self._faiss is not None:
+            scores, rows = self._index.search(self._as_matrix([vector]), k)
+            return [(float(s), int(r)) for s, r in zip(scores[0], rows[0]) if r >= 0]
+        scored = [
+            (sum(a * b for a, b in zip(vector, other)), row)
+            for row, other in enumerate(self._vectors)
+        ]
+        scored.sort(reverse=True)
+        return scored[:k]
+    
+    def _as_matrix(self, vectors: List[List[float]]) -> Any:
+        import numpy
+        return numpy.asarray(vectors, dtype="float32")
@@ -5,33 +5,42 @@ Prompt Auto Refactor Tool - Main Entry Point
 A tool for automatic code refactoring based on natural language prompts.
 """
 
-import click
+import argparse
 import sys
+from functools import cached_property
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
-# Handle different execution contexts
+# Make the `src` package importable when run from inside the src directory
 try:
-    # When run from the project root
-    from src.analyzer.code_analyzer import CodeAnalyzer
-    from src.refactor.refactoring_engine import RefactoringEngine
-    from src.prompt.prompt_processor import PromptProcessor
-    from src.generator.code_generator import CodeGenerator, GenerationOptions
+    import src  # noqa: F401
 except ImportError:
-    # When run from the src directory
-    sys.path.insert(0, str(Path(__file__).parent))
-    from analyzer.code_analyzer import CodeAnalyzer
-    from refactor.refactoring_engine import RefactoringEngine
-    from prompt.prompt_processor import PromptProcessor
-    from generator.code_generator import CodeGenerator, GenerationOptions
+    sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
 class PromptAutoRefactor:
-    def __init__(self):
-        self.analyzer = CodeAnalyzer()
-        self.processor = PromptProcessor()
-        self.engine = RefactoringEngine()
-        self.generator = CodeGenerator()
+    # Components are built on first use so each CLI command only imports and
+    # constructs what it actually needs
+    
+    @cached_property
+    def analyzer(self):
+        from src.analyzer.code_analyzer import CodeAnalyzer
+        return CodeAnalyzer()
+    
+    @cached_property
+    def processor(self):
+        from src.prompt.prompt_processor import PromptProcessor
+        return PromptProcessor()
+    
+    @cached_property
+    def engine(self):
+        from src.refactor.refactoring_engine import RefactoringEngine
+        return RefactoringEngine()
+    
+    @cached_property
+    def generator(self):
+        from src.generator.code_generator import CodeGenerator
+        return CodeGenerator()
     
     def refactor_code(self, code: str, prompt: str, language: str = "python", 
                      formatting_style: str = "black", 
@@ -50,6 +59,7 @@ class PromptAutoRefactor:
             refactored_code = self.engine.apply_refactoring(code, operation)
             
             # 4. Generate clean output
+            from src.generator.code_generator import GenerationOptions
             options = GenerationOptions(
                 language=language,
                 formatting_style=formatting_style,
@@ -67,14 +77,8 @@ class PromptAutoRefactor:
         Analyze code and suggest refactoring opportunities
         """
         try:
-            # Parse code structure
-            parse_result = self.analyzer.parse_code(code, language)
-            
-            # Identify code smells
-            smells = self.analyzer.identify_code_smells(code, language)
-            
-            # Generate suggestions
-            suggestions = self.analyzer.generate_suggestions(code, language)
+            # Parse structure, identify code smells and generate suggestions in one pass
+            parse_result, smells, suggestions = self.analyzer.full_analyze(code, language)
             
             return {
                 "structure": parse_result,
@@ -85,66 +89,72 @@ class PromptAutoRefactor:
             raise RuntimeError(f"Analysis failed: {str(e)}")
 
 
-@click.group()
-@click.version_option(version="1.0.0")
-def cli():
-    """Prompt Auto Refactor Tool - Automatic code refactoring based on natural language prompts."""
-    pass
+def _read_file(path: str) -> str:
+    """Read a source file as UTF-8 without text-mode newline translation."""
+    return Path(path).read_bytes().decode('utf-8')
+
+
+def _read_stdin() -> str:
+    """Read all of stdin as UTF-8 straight from the binary buffer."""
+    return sys.stdin.buffer.read().decode('utf-8')
 
 
-@cli.command()
-@click.option('--file', '-f', type=click.Path(exists=True), help='Input file to refactor')
-@click.option('--prompt', '-p', required=True, help='Refactoring prompt')
-@click.option('--output', '-o', type=click.Path(), help='Output file (default: stdout)')
-@click.option('--language', '-l', default='python', help='Programming language')
-@click.option('--style', '-s', default='black', help='Formatting style')
-@click.option('--no-comments', is_flag=True, help='Remove comments from output')
-@click.option('--interactive', '-i', is_flag=True, help='Interactive mode')
-def refactor(file: Optional[str], prompt: str, output: Optional[str], 
-            language: str, style: str, no_comments: bool, interactive: bool):
+def _read_code_block() -> str:
+    """Read an interactive code block, ending at a line holding only '.' or EOF."""
+    lines = []
+    for line in iter(sys.stdin.readline, ''):
+        if line.rstrip('\r\n') == '.':
+            break
+        lines.append(line)
+    return ''.join(lines)
+
+
+def refactor(args: argparse.Namespace) -> None:
     """Refactor code based on a natural language prompt."""
+    file, prompt, output = args.file, args.prompt, args.output
+    language, style = args.language, args.style
+    no_comments, interactive = args.no_comments, args.interactive
     
     tool = PromptAutoRefactor()
     
     try:
         # Read input
         if file:
-            with open(file, 'r') as f:
-                code = f.read()
+            code = _read_file(file)
         else:
             if interactive:
-                click.echo("Enter your code (end with Ctrl+D on Unix or Ctrl+Z on Windows):")
-            code = sys.stdin.read()
+                print("Enter your code (end with Ctrl+D on Unix or Ctrl+Z on Windows):")
+            code = _read_stdin()
         
         if not code.strip():
-            click.echo("Error: No code provided", err=True)
+            print("Error: No code provided", file=sys.stderr)
             sys.exit(1)
         
         # Show original code analysis in interactive mode
         if interactive:
-            click.echo("\n" + "="*50)
-            click.echo("ORIGINAL CODE ANALYSIS")
-            click.echo("="*50)
+            print("\n" + "="*50)
+            print("ORIGINAL CODE ANALYSIS")
+            print("="*50)
             
             analysis = tool.analyze_code(code, language)
             
-            click.echo(f"Functions: {analysis['structure'].functions}")
-            click.echo(f"Classes: {analysis['structure'].classes}")
-            click.echo(f"Methods: {analysis['structure'].methods}")
+            print(f"Functions: {analysis['structure'].functions}")
+            print(f"Classes: {analysis['structure'].classes}")
+            print(f"Methods: {analysis['structure'].methods}")
             
             if analysis['code_smells']:
-                click.echo("\nCode Smells Found:")
+                print("\nCode Smells Found:")
                 for smell in analysis['code_smells']:
-                    click.echo(f"  - Line {smell.line}: {smell.description}")
+                    print(f"  - Line {smell.line}: {smell.description}")
             
             if analysis['suggestions']:
-                click.echo("\nRefactoring Suggestions:")
+                print("\nRefactoring Suggestions:")
                 for suggestion in analysis['suggestions']:
-                    click.echo(f"  - {suggestion.description}")
+                    print(f"  - {suggestion.description}")
             
-            click.echo("\n" + "="*50)
-            click.echo("APPLYING REFACTORING")
-            click.echo("="*50)
+            print("\n" + "="*50)
+            print("APPLYING REFACTORING")
+            print("="*50)
         
         # Apply refactoring
         result = tool.refactor_code(
@@ -159,92 +169,88 @@ def refactor(file: Optional[str], prompt: str, output: Optional[str],
         if output:
             with open(output, 'w') as f:
                 f.write(result)
-            click.echo(f"Refactored code written to {output}")
+            print(f"Refactored code written to {output}")
         else:
             if interactive:
-                click.echo("\nREFACTORED CODE:")
-                click.echo("-" * 30)
-            click.echo(result)
+                print("\nREFACTORED CODE:")
+                print("-" * 30)
+            print(result)
         
         if interactive:
-            click.echo("\n" + "="*50)
-            click.echo("REFACTORING COMPLETED SUCCESSFULLY")
-            click.echo("="*50)
+            print("\n" + "="*50)
+            print("REFACTORING COMPLETED SUCCESSFULLY")
+            print("="*50)
             
     except Exception as e:
-        click.echo(f"Error: {str(e)}", err=True)
+        print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
 
-@cli.command()
-@click.option('--file', '-f', type=click.Path(exists=True), help='File to analyze')
-@click.option('--language', '-l', default='python', help='Programming language')
-def analyze(file: Optional[str], language: str):
+def analyze(args: argparse.Namespace) -> None:
     """Analyze code and suggest refactoring opportunities."""
+    file, language = args.file, args.language
     
     tool = PromptAutoRefactor()
     
     try:
         # Read input
         if file:
-            with open(file, 'r') as f:
-                code = f.read()
+            code = _read_file(file)
         else:
-            code = sys.stdin.read()
+            code = _read_stdin()
         
         if not code.strip():
-            click.echo("Error: No code provided", err=True)
+            print("Error: No code provided", file=sys.stderr)
             sys.exit(1)
         
         # Analyze code
         analysis = tool.analyze_code(code, language)
         
         # Display results
-        click.echo("CODE STRUCTURE:")
-        click.echo(f"  Functions: {', '.join(analysis['structure'].functions) if analysis['structure'].functions else 'None'}")
-        click.echo(f"  Classes: {', '.join(analysis['structure'].classes) if analysis['structure'].classes else 'None'}")
+        print("CODE STRUCTURE:")
+        print(f"  Functions: {', '.join(analysis['structure'].functions) if analysis['structure'].functions else 'None'}")
+        print(f"  Classes: {', '.join(analysis['structure'].classes) if analysis['structure'].classes else 'None'}")
         if analysis['structure'].methods:
-            click.echo("  Methods:")
+            print("  Methods:")
             for class_name, methods in analysis['structure'].methods.items():
-                click.echo(f"    {class_name}: {', '.join(methods)}")
+                print(f"    {class_name}: {', '.join(methods)}")
         
         if analysis['code_smells']:
-            click.echo("\nCODE SMELLS:")
+            print("\nCODE SMELLS:")
             for smell in analysis['code_smells']:
-                click.echo(f"  Line {smell.line}: {smell.type} - {smell.description}")
+                print(f"  Line {smell.line}: {smell.type} - {smell.description}")
         else:
-            click.echo("\nCODE SMELLS: None detected")
+            print("\nCODE SMELLS: None detected")
         
         if analysis['suggestions']:
-            click.echo("\nREFACTORING SUGGESTIONS:")
+            print("\nREFACTORING SUGGESTIONS:")
             for i, suggestion in enumerate(analysis['suggestions'], 1):
-                click.echo(f"  {i}. {suggestion.description} (Priority: {suggestion.priority})")
+                print(f"  {i}. {suggestion.description} (Priority: {suggestion.priority})")
         else:
-            click.echo("\nREFACTORING SUGGESTIONS: No suggestions")
+            print("\nREFACTORING SUGGESTIONS: No suggestions")
             
     except Exception as e:
-        click.echo(f"Error: {str(e)}", err=True)
+        print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
 
-@cli.command()
-def interactive():
+def interactive(args: argparse.Namespace) -> None:
     """Start interactive refactoring session."""
     
     tool = PromptAutoRefactor()
     
-    click.echo("Welcome to Prompt Auto Refactor Tool!")
-    click.echo("Enter 'help' for available commands, 'quit' to exit.")
+    print("Welcome to Prompt Auto Refactor Tool!")
+    print("Enter 'help' for available commands, 'quit' to exit.")
     
     while True:
         try:
-            command = click.prompt("\nrefactor> ", type=str).strip()
+            command = input("\nrefactor> ").strip()
             
             if command.lower() in ['quit', 'exit', 'q']:
-                click.echo("Goodbye!")
+                print("Goodbye!")
                 break
             elif command.lower() == 'help':
-                click.echo("""
+                print("""
 Available commands:
   analyze <language>  - Analyze code from stdin
   refactor <prompt>   - Refactor code with prompt
@@ -255,39 +261,76 @@ Available commands:
                 parts = command.split(maxsplit=1)
                 language = parts[1] if len(parts) > 1 else 'python'
                 
-                click.echo("Enter your code (end with Ctrl+D):")
-                code = sys.stdin.read()
+                print("Enter your code (end with a line containing only '.'):")
+                code = _read_code_block()
                 
                 analysis = tool.analyze_code(code, language)
                 
-                click.echo("ANALYSIS RESULTS:")
-                click.echo(f"Functions: {analysis['structure'].functions}")
-                click.echo(f"Classes: {analysis['structure'].classes}")
+                print("ANALYSIS RESULTS:")
+                print(f"Functions: {analysis['structure'].functions}")
+                print(f"Classes: {analysis['structure'].classes}")
                 if analysis['code_smells']:
-                    click.echo("Code smells found:")
+                    print("Code smells found:")
                     for smell in analysis['code_smells']:
-                        click.echo(f"  - {smell.description}")
+                        print(f"  - {smell.description}")
                         
             elif command.startswith('refactor'):
                 prompt = command[8:].strip()  # Remove 'refactor '
                 if not prompt:
-                    click.echo("Please provide a refactoring prompt")
+                    print("Please provide a refactoring prompt")
                     continue
                 
-                click.echo("Enter your code (end with Ctrl+D):")
-                code = sys.stdin.read()
+                print("Enter your code (end with a line containing only '.'):")
+                code = _read_code_block()
                 
                 result = tool.refactor_code(code, prompt)
-                click.echo("REFACTORED CODE:")
-                click.echo(result)
+                print("REFACTORED CODE:")
+                print(result)
             else:
-                click.echo("Unknown command. Type 'help' for available commands.")
+                print("Unknown command. Type 'help' for available commands.")
                 
         except (KeyboardInterrupt, EOFError):
-            click.echo("\nGoodbye!")
+            print("\nGoodbye!")
             break
         except Exception as e:
-            click.echo(f"Error: {str(e)}")
+            print(f"Error: {str(e)}")
+
+
+def _existing_file(path: str) -> str:
+    if not Path(path).exists():
+        raise argparse.ArgumentTypeError(f"Path '{path}' does not exist.")
+    return path
+
+
+def cli(argv: Optional[List[str]] = None) -> None:
+    """Prompt Auto Refactor Tool - Automatic code refactoring based on natural language prompts."""
+    parser = argparse.ArgumentParser(prog='refactor', description=cli.__doc__)
+    parser.add_argument('--version', action='version', version='%(prog)s 1.0.0')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    
+    refactor_parser = subparsers.add_parser('refactor', help=refactor.__doc__, description=refactor.__doc__)
+    refactor_parser.add_argument('--file', '-f', type=_existing_file, help='Input file to refactor')
+    refactor_parser.add_argument('--prompt', '-p', required=True, help='Refactoring prompt')
+    refactor_parser.add_argument('--output', '-o', help='Output file (default: stdout)')
+    refactor_parser.add_argument('--language', '-l', default='python', help='Programming language')
+    refactor_parser.add_argument('--style', '-s', default='black', help='Formatting style')
+    refactor_parser.add_argument('--no-comments', action='store_true', help='Remove comments from output')
+    refactor_parser.add_argument('--interactive', '-i', action='store_true', help='Interactive mode')
+    refactor_parser.set_defaults(handler=refactor)
+    
+    analyze_parser = subparsers.add_parser('analyze', help=analyze.__doc__, description=analyze.__doc__)
+    analyze_parser.add_argument('--file', '-f', type=_existing_file, help='File to analyze')
+    analyze_parser.add_argument('--language', '-l', default='python', help='Programming language')
+    analyze_parser.set_defaults(handler=analyze)
+    
+    interactive_parser = subparsers.add_parser('interactive', help=interactive.__doc__, description=interactive.__doc__)
+    interactive_parser.set_defaults(handler=interactive)
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return
+    args.handler(args)
 
 
 if __name__ == '__main__':
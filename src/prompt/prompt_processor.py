@@ -1,13 +1,33 @@
 import re
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from typing import List, Optional, Dict, Set, Tuple
 try:
-    from src.refactor.refactoring_engine import RefactoringOperation
+    from src._compat import DATACLASS_SLOTS
 except ImportError:
-    from refactor.refactoring_engine import RefactoringOperation
+    from _compat import DATACLASS_SLOTS
+try:
+    from src.refactor.refactoring_engine import RefactoringBatch, RefactoringOperation
+except ImportError:
+    from refactor.refactoring_engine import RefactoringBatch, RefactoringOperation
 
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
-@dataclass
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class RefactoringRequest:
     operation_type: str
     method_name: str = None
@@ -19,163 +39,298 @@ class RefactoringRequest:
     function_name: str = None
     source_class: str = None
     target_class: str = None
-    dead_functions: List[str] = None
+    dead_functions: Tuple[str, ...] = None
+    
+    def __post_init__(self):
+        # Lists are accepted but stored as tuples, so requests are hashable
+        if self.dead_functions is not None:
+            object.__setattr__(self, "dead_functions", tuple(self.dead_functions))
+
+
+class _KeywordMatcher:
+    """Finds which keyword categories occur in a lowercase text
+    
+    With pyahocorasick installed, one automaton pass finds every keyword;
+    otherwise each category is checked with substring tests.
+    """
+    
+    def __init__(self, categories: Dict[str, List[str]]):
+        self._categories = categories
+        self._automaton = None
+        if ahocorasick is not None:
+            owners: Dict[str, Set[str]] = {}
+            for category, keywords in categories.items():
+                for keyword in keywords:
+                    owners.setdefault(keyword, set()).add(category)
+            automaton = ahocorasick.Automaton()
+            for keyword, keyword_categories in owners.items():
+                automaton.add_word(keyword, frozenset(keyword_categories))
+            automaton.make_automaton()
+            self._automaton = automaton
+    
+    def find(self, text: str) -> Set[str]:
+        """Categories with at least one keyword in text"""
+        if self._automaton is not None:
+            found: Set[str] = set()
+            for _, keyword_categories in self._automaton.iter(text):
+                found |= keyword_categories
+            return found
+        return {
+            category for category, keywords in self._categories.items()
+            if any(keyword in text for keyword in keywords)
+        }
+
+
+_OPERATION_PATTERNS = {
+    'extract_method': [
+        r'extract.*(?:from\s+)?lines?\s+(\d+)[-\s]*(?:to\s+)?(\d+).*(?:method|function)\s+(?:called\s+)?["\']?(\w+)["\']?',
+        r'extract.*(?:method|function)\s+(?:called\s+)?["\']?(\w+)["\']?.*(?:from\s+)?lines?\s+(\d+)[-\s]*(?:to\s+)?(\d+)',
+        r'extract.*validation\s+logic',
+        r'extract.*calculation\s+logic'
+    ],
+    'rename_function': [
+        r'rename\s+function\s+["\']?(\w+)["\']?\s+to\s+["\']?(\w+)["\']?',
+        r'rename.*function.*["\']?(\w+)["\']?.*["\']?(\w+)["\']?',
+        r'rename.*function.*more\s+descriptive'
+    ],
+    'rename_variable': [
+        r'rename\s+variable\s+["\']?(\w+)["\']?\s+to\s+["\']?(\w+)["\']?',
+        r'variable\s+name.*unclear.*change',
+        r'rename.*variable'
+    ],
+    'inline_variable': [
+        r'inline.*variable\s+["\']?(\w+)["\']?'
+    ],
+    'inline_function': [
+        r'inline.*function\s+["\']?(\w+)["\']?'
+    ],
+    'move_method': [
+        r'move\s+method\s+["\']?(\w+)["\']?\s+from\s+(\w+)\s+(?:class\s+)?to\s+(\w+)\s+(?:class)?'
+    ],
+    'remove_dead_code': [
+        r'remove\s+unused\s+(?:functions?|methods?):\s*(.*)',
+        r'remove.*unused\s+method'
+    ]
+}
+
+# Compiled once; IGNORECASE lets the patterns run on the original prompt, so
+# captured names keep their case
+_COMPILED_PATTERNS = {
+    operation_type: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    for operation_type, patterns in _OPERATION_PATTERNS.items()
+}
+# Flat (operation_type, pattern) table in priority order; its indices are the
+# Hyperscan pattern ids
+_PATTERN_TABLE = [
+    (operation_type, pattern)
+    for operation_type, patterns in _COMPILED_PATTERNS.items()
+    for pattern in patterns
+]
+
+
+def _build_hyperscan_db(table):
+    if hyperscan is None:
+        return None
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+    db = hyperscan.Database()
+    try:
+        db.compile(
+            expressions=[pattern.pattern.encode() for _, pattern in table],
+            ids=list(range(len(table))),
+            flags=[flags] * len(table)
+        )
+    except hyperscan.error:
+        return None
+    return db
+
+
+_HYPERSCAN_DB = _build_hyperscan_db(_PATTERN_TABLE)
+
+_INTENT_KEYWORDS = {
+    'extract_method': ['extract', 'separate', 'split', 'factor out', 'pull out'],
+    'rename_function': ['rename function', 'change function name', 'better name'],
+    'rename_variable': ['rename variable', 'change variable', 'unclear', 'descriptive'],
+    'inline_variable': ['inline variable', 'substitute'],
+    'inline_function': ['inline function', 'expand'],
+    'move_method': ['move method', 'relocate'],
+    'remove_dead_code': ['remove unused', 'dead code', 'clean up']
+}
+
+# Screening phrases and intent keywords, found together in one scan
+_KEYWORD_MATCHER = _KeywordMatcher({
+    'ambiguous': ['make', 'better', 'improve', 'optimize'],
+    'explicit': ['extract', 'rename', 'inline', 'move', 'remove'],
+    'unsupported': ['convert', 'translate', 'different language'],
+    # Every operation pattern requires one of these words
+    'pattern_words': ['extract', 'rename', 'variable', 'inline', 'move', 'remove'],
+    **_INTENT_KEYWORDS
+})
+# Flat keyword list for fuzzy matching; indices map back to operations
+_INTENT_FLAT = [(keyword, op) for op, keywords in _INTENT_KEYWORDS.items() for keyword in keywords]
+_INTENT_KEYS = [keyword for keyword, _ in _INTENT_FLAT]
+
+# Code smells named in a prompt and what to suggest for each, in output order
+_SMELL_KEYWORDS = {
+    'duplication': ['duplicate', 'repeated', 'similar'],
+    'complexity': ['long', 'complex', 'too many'],
+    'unclear': ['unclear', 'confusing', 'hard to understand'],
+    'unused': ['unused', 'dead', 'not used'],
+}
+_SUGGESTIONS = {
+    'duplication': ["Extract common functionality into a shared method", "Remove duplicate code"],
+    'complexity': ["Extract methods to reduce complexity", "Break down into smaller functions"],
+    'unclear': ["Rename variables and functions for clarity", "Add descriptive method names"],
+    'unused': ["Remove unused code"],
+}
+_SUGGESTION_MATCHER = _KeywordMatcher(_SMELL_KEYWORDS)
+
+
+def _extract_method_request(groups, prompt_lower: str) -> RefactoringRequest:
+    if len(groups) >= 3 and groups[2]:  # method name in third group
+        return RefactoringRequest(
+            operation_type="extract_method",
+            method_name=groups[2],
+            start_line=int(groups[0]) if groups[0] else None,
+            end_line=int(groups[1]) if groups[1] else None
+        )
+    elif len(groups) >= 1 and groups[0]:  # method name in first group
+        return RefactoringRequest(
+            operation_type="extract_method",
+            method_name=groups[0],
+            start_line=int(groups[1]) if len(groups) > 1 and groups[1] else None,
+            end_line=int(groups[2]) if len(groups) > 2 and groups[2] else None
+        )
+    # Default method name for validation/calculation logic
+    method_name = "extracted_method"
+    if "validation" in prompt_lower:
+        method_name = "validate"
+    elif "calculation" in prompt_lower:
+        method_name = "calculate"
+    return RefactoringRequest(operation_type="extract_method", method_name=method_name)
+
+
+def _rename_request(operation_type: str):
+    def build(groups, prompt_lower: str) -> Optional[RefactoringRequest]:
+        if len(groups) >= 2:
+            return RefactoringRequest(operation_type=operation_type, old_name=groups[0], new_name=groups[1])
+        return None
+    return build
+
+
+def _inline_variable_request(groups, prompt_lower: str) -> RefactoringRequest:
+    return RefactoringRequest(operation_type="inline_variable", variable_name=groups[0] if groups else None)
+
+
+def _inline_function_request(groups, prompt_lower: str) -> RefactoringRequest:
+    return RefactoringRequest(operation_type="inline_function", function_name=groups[0] if groups else None)
+
+
+def _move_method_request(groups, prompt_lower: str) -> Optional[RefactoringRequest]:
+    if len(groups) >= 3:
+        return RefactoringRequest(
+            operation_type="move_method",
+            method_name=groups[0],
+            source_class=groups[1],
+            target_class=groups[2]
+        )
+    return None
+
+
+def _remove_dead_code_request(groups, prompt_lower: str) -> Optional[RefactoringRequest]:
+    if groups and groups[0]:
+        functions = [f.strip() for f in groups[0].split(',')]
+        return RefactoringRequest(operation_type="remove_dead_code", dead_functions=functions)
+    return None
+
+
+# Builds the request for a matched pattern from its groups; None means a
+# bare request of that type
+_REQUEST_BUILDERS = {
+    'extract_method': _extract_method_request,
+    'rename_function': _rename_request('rename_function'),
+    'rename_variable': _rename_request('rename_variable'),
+    'inline_variable': _inline_variable_request,
+    'inline_function': _inline_function_request,
+    'move_method': _move_method_request,
+    'remove_dead_code': _remove_dead_code_request,
+}
 
 
 class PromptProcessor:
     def __init__(self):
-        self.operation_patterns = {
-            'extract_method': [
-                r'extract.*(?:from\s+)?lines?\s+(\d+)[-\s]*(?:to\s+)?(\d+).*(?:method|function)\s+(?:called\s+)?["\']?(\w+)["\']?',
-                r'extract.*(?:method|function)\s+(?:called\s+)?["\']?(\w+)["\']?.*(?:from\s+)?lines?\s+(\d+)[-\s]*(?:to\s+)?(\d+)',
-                r'extract.*validation\s+logic',
-                r'extract.*calculation\s+logic'
-            ],
-            'rename_function': [
-                r'rename\s+function\s+["\']?(\w+)["\']?\s+to\s+["\']?(\w+)["\']?',
-                r'rename.*function.*["\']?(\w+)["\']?.*["\']?(\w+)["\']?',
-                r'rename.*function.*more\s+descriptive'
-            ],
-            'rename_variable': [
-                r'rename\s+variable\s+["\']?(\w+)["\']?\s+to\s+["\']?(\w+)["\']?',
-                r'variable\s+name.*unclear.*change',
-                r'rename.*variable'
-            ],
-            'inline_variable': [
-                r'inline.*variable\s+["\']?(\w+)["\']?'
-            ],
-            'inline_function': [
-                r'inline.*function\s+["\']?(\w+)["\']?'
-            ],
-            'move_method': [
-                r'move\s+method\s+["\']?(\w+)["\']?\s+from\s+(\w+)\s+(?:class\s+)?to\s+(\w+)\s+(?:class)?'
-            ],
-            'remove_dead_code': [
-                r'remove\s+unused\s+(?:functions?|methods?):\s*(.*)',
-                r'remove.*unused\s+method'
-            ]
-        }
-        
-        self.intent_keywords = {
-            'extract_method': ['extract', 'separate', 'split', 'factor out', 'pull out'],
-            'rename_function': ['rename function', 'change function name', 'better name'],
-            'rename_variable': ['rename variable', 'change variable', 'unclear', 'descriptive'],
-            'inline_variable': ['inline variable', 'substitute'],
-            'inline_function': ['inline function', 'expand'],
-            'move_method': ['move method', 'relocate'],
-            'remove_dead_code': ['remove unused', 'dead code', 'clean up']
-        }
+        # Pattern and keyword tables are compiled once per process and
+        # shared by every instance
+        self.operation_patterns = _OPERATION_PATTERNS
+        self._compiled_patterns = _COMPILED_PATTERNS
+        self._pattern_table = _PATTERN_TABLE
+        self._hyperscan_db = _HYPERSCAN_DB
+        self.intent_keywords = _INTENT_KEYWORDS
+        self._keyword_matcher = _KEYWORD_MATCHER
+        self._intent_flat = _INTENT_FLAT
+        self._intent_keys = _INTENT_KEYS
+        self._suggestions = _SUGGESTIONS
+        self._suggestion_matcher = _SUGGESTION_MATCHER
+        self._request_builders = _REQUEST_BUILDERS
+        # UIs and validate-then-parse flows see the same prompt repeatedly;
+        # requests and operations are frozen, so cached ones can be shared
+        self._parse_cached = lru_cache(maxsize=1024)(self._parse_uncached)
+        self._convert_cached = lru_cache(maxsize=256)(self._convert_uncached)
     
     def parse_prompt(self, prompt: str) -> RefactoringRequest:
+        return self._parse_cached(prompt)
+    
+    def _parse_uncached(self, prompt: str) -> RefactoringRequest:
         prompt_lower = prompt.lower()
+        found = self._keyword_matcher.find(prompt_lower)
         
         # Check for ambiguous prompts
-        if any(phrase in prompt_lower for phrase in ['make', 'better', 'improve', 'optimize']) and not any(op in prompt_lower for op in ['extract', 'rename', 'inline', 'move', 'remove']):
+        if 'ambiguous' in found and 'explicit' not in found:
             raise ValueError("Ambiguous prompt: Please specify the type of refactoring you want")
         
         # Check for unsupported operations
-        if any(phrase in prompt_lower for phrase in ['convert', 'translate', 'different language']):
+        if 'unsupported' in found:
             raise NotImplementedError("Language conversion is not supported")
         
-        for operation_type, patterns in self.operation_patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, prompt_lower)
+        if 'pattern_words' in found:
+            for operation_type, pattern in self._candidate_patterns(prompt):
+                match = pattern.search(prompt)
                 if match:
                     return self._create_request_from_match(operation_type, match, prompt_lower, prompt)
         
         # Fallback to intent extraction
-        intent = self.extract_intent(prompt)
+        intent = self._match_intent(prompt_lower, found)
         if intent:
             return RefactoringRequest(operation_type=intent)
         
         raise ValueError("Could not parse the refactoring request from the prompt")
     
-    def _create_request_from_match(self, operation_type: str, match, prompt_lower: str, original_prompt: str) -> RefactoringRequest:
-        groups = match.groups()
+    def _candidate_patterns(self, prompt: str):
+        """Patterns worth running with re, in priority order
         
-        if operation_type == "extract_method":
-            if len(groups) >= 3 and groups[2]:  # method name in third group
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    method_name=groups[2],
-                    start_line=int(groups[0]) if groups[0] else None,
-                    end_line=int(groups[1]) if groups[1] else None
-                )
-            elif len(groups) >= 1 and groups[0]:  # method name in first group
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    method_name=groups[0],
-                    start_line=int(groups[1]) if len(groups) > 1 and groups[1] else None,
-                    end_line=int(groups[2]) if len(groups) > 2 and groups[2] else None
-                )
-            else:
-                # Default method name for validation/calculation logic
-                method_name = "extracted_method"
-                if "validation" in prompt_lower:
-                    method_name = "validate"
-                elif "calculation" in prompt_lower:
-                    method_name = "calculate"
-                return RefactoringRequest(operation_type=operation_type, method_name=method_name)
+        With Hyperscan all patterns are matched in one pass and only the hits
+        are re-run to extract groups; otherwise every pattern is a candidate.
+        """
+        if self._hyperscan_db is None:
+            return self._pattern_table
+        hits = set()
         
-        elif operation_type == "rename_function":
-            if len(groups) >= 2:
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    old_name=groups[0],
-                    new_name=groups[1]
-                )
-            else:
-                return RefactoringRequest(operation_type=operation_type)
+        def on_match(pattern_id, start, end, flags, context):
+            hits.add(pattern_id)
         
-        elif operation_type == "rename_variable":
-            if len(groups) >= 2:
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    old_name=groups[0],
-                    new_name=groups[1]
-                )
-            else:
-                return RefactoringRequest(operation_type=operation_type)
-        
-        elif operation_type == "inline_variable":
-            return RefactoringRequest(
-                operation_type=operation_type,
-                variable_name=groups[0] if groups else None
-            )
-        
-        elif operation_type == "inline_function":
-            return RefactoringRequest(
-                operation_type=operation_type,
-                function_name=groups[0] if groups else None
-            )
-        
-        elif operation_type == "move_method":
-            if len(groups) >= 3:
-                # Extract original case from the original prompt
-                source_match = re.search(r'from\s+(\w+)', original_prompt, re.IGNORECASE)
-                target_match = re.search(r'to\s+(\w+)', original_prompt, re.IGNORECASE)
-                
-                source_class = source_match.group(1) if source_match else groups[1].title()
-                target_class = target_match.group(1) if target_match else groups[2].title()
-                
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    method_name=groups[0],
-                    source_class=source_class,
-                    target_class=target_class
-                )
-        
-        elif operation_type == "remove_dead_code":
-            if groups and groups[0]:
-                functions = [f.strip() for f in groups[0].split(',')]
-                return RefactoringRequest(
-                    operation_type=operation_type,
-                    dead_functions=functions
-                )
-            else:
-                return RefactoringRequest(operation_type=operation_type)
-        
-        return RefactoringRequest(operation_type=operation_type)
+        self._hyperscan_db.scan(prompt.encode(), match_event_handler=on_match)
+        return [self._pattern_table[pattern_id] for pattern_id in sorted(hits)]
+    
+    def _create_request_from_match(self, operation_type: str, match, prompt_lower: str, original_prompt: str) -> RefactoringRequest:
+        builder = self._request_builders.get(operation_type)
+        request = builder(match.groups(), prompt_lower) if builder else None
+        return request or RefactoringRequest(operation_type=operation_type)
+    
+    def parse_prompts(self, prompts: List[str]) -> RefactoringBatch:
+        """Parse several prompts into one column-wise batch of operations"""
+        batch = RefactoringBatch()
+        for prompt in prompts:
+            batch.append(self.convert_to_operation(self.parse_prompt(prompt)))
+        return batch
     
     def validate_prompt(self, prompt: str) -> bool:
         try:
@@ -185,6 +340,9 @@ class PromptProcessor:
             return False
     
     def convert_to_operation(self, request: RefactoringRequest) -> RefactoringOperation:
+        return self._convert_cached(request)
+    
+    def _convert_uncached(self, request: RefactoringRequest) -> RefactoringOperation:
         operation_args = {
             'type': request.operation_type
         }
@@ -214,31 +372,26 @@ class PromptProcessor:
     
     def extract_intent(self, prompt: str) -> Optional[str]:
         prompt_lower = prompt.lower()
+        return self._match_intent(prompt_lower, self._keyword_matcher.find(prompt_lower))
+    
+    def _match_intent(self, prompt_lower: str, found: Set[str]) -> Optional[str]:
+        for operation_type in self.intent_keywords:
+            if operation_type in found:
+                return operation_type
         
-        for operation_type, keywords in self.intent_keywords.items():
-            for keyword in keywords:
-                if keyword in prompt_lower:
-                    return operation_type
+        # No exact keyword; tolerate typos ("extarct") when rapidfuzz is installed
+        if process is not None:
+            match = process.extractOne(prompt_lower, self._intent_keys, scorer=fuzz.partial_ratio, score_cutoff=85)
+            if match:
+                return self._intent_flat[match[2]][1]
         
         return None
     
     def suggest_refactoring(self, prompt: str) -> List[str]:
-        suggestions = []
-        prompt_lower = prompt.lower()
-        
-        if any(word in prompt_lower for word in ['duplicate', 'repeated', 'similar']):
-            suggestions.append("Extract common functionality into a shared method")
-            suggestions.append("Remove duplicate code")
-        
-        if any(word in prompt_lower for word in ['long', 'complex', 'too many']):
-            suggestions.append("Extract methods to reduce complexity")
-            suggestions.append("Break down into smaller functions")
-        
-        if any(word in prompt_lower for word in ['unclear', 'confusing', 'hard to understand']):
-            suggestions.append("Rename variables and functions for clarity")
-            suggestions.append("Add descriptive method names")
-        
-        if any(word in prompt_lower for word in ['unused', 'dead', 'not used']):
-            suggestions.append("Remove unused code")
-        
-        return suggestions if suggestions else ["Consider extracting methods or renaming for clarity"]
\ No newline at end of file
+        found = self._suggestion_matcher.find(prompt.lower())
+        suggestions = [
+            suggestion
+            for category, category_suggestions in self._suggestions.items() if category in found
+            for suggestion in category_suggestions
+        ]
+        return suggestions if suggestions else ["Consider extracting methods or renaming for clarity"]
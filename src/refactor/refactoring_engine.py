@@ -1,10 +1,167 @@
 import ast
+import copy
 import re
-from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
+import zlib
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Iterable, List, Optional, Dict, Any, Set, Tuple
+try:
+    from src._compat import DATACLASS_SLOTS
+except ImportError:
+    from _compat import DATACLASS_SLOTS
 
 
-@dataclass
+@lru_cache(maxsize=128)
+def _parse_cached(code: str) -> Optional[ast.Module]:
+    # Shared trees for read-only uses (checks, rename planning); transformers
+    # mutate, so they parse their own tree (cheaper than copy.deepcopy)
+    try:
+        return ast.parse(code)
+    except SyntaxError:
+        return None
+
+
+# Prefix between a (async) def node's position and its name, line
+# continuations included
+_RE_DEF_PREFIX = re.compile(rb'(?:async(?:\s|\\)+)?def(?:\s|\\)+')
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
+class _CompiledSource:
+    """What the read-only checks need from a source, built once per source"""
+    source: str
+    tree: Optional[ast.Module]
+    # Identifiers bound or used: names, parameters, def and class names
+    names: frozenset
+
+
+@lru_cache(maxsize=128)
+def _compile_source(code: str) -> _CompiledSource:
+    tree = _parse_cached(code)
+    names = set()
+    if tree is not None:
+        # Exact type checks; none of these node classes has subclasses
+        for node in ast.walk(tree):
+            node_type = type(node)
+            if node_type is ast.Name:
+                names.add(node.id)
+            elif node_type is ast.arg:
+                names.add(node.arg)
+            elif node_type is ast.FunctionDef or node_type is ast.AsyncFunctionDef or node_type is ast.ClassDef:
+                names.add(node.name)
+    return _CompiledSource(code, tree, frozenset(names))
+
+
+@lru_cache(maxsize=32)
+def _source_lines(code: str) -> Tuple[bytes, ...]:
+    # Lines as the parser numbers them (bytes.splitlines only breaks at \n,
+    # \r\n and \r, unlike str.splitlines); AST columns are byte offsets
+    return tuple(code.encode().splitlines(keepends=True))
+
+
+@lru_cache(maxsize=32)
+def _line_offsets(code: str) -> Tuple[int, ...]:
+    # Byte offset of each (1-based) line; the entry after the last line is the end
+    offsets = [0, 0]
+    for line in _source_lines(code):
+        offsets.append(offsets[-1] + len(line))
+    return tuple(offsets)
+
+
+def _join_splices(source: bytes, splices: List[tuple], start: int = 0, end: int = None) -> bytes:
+    # source[start:end] with the (start, end, replacement) byte ranges replaced
+    end = len(source) if end is None else end
+    parts = []
+    position = start
+    for splice_start, splice_end, replacement in sorted(splices):
+        parts.append(source[position:splice_start])
+        parts.append(replacement)
+        position = splice_end
+    parts.append(source[position:end])
+    return b''.join(parts)
+
+
+def _splice_renames(code: str, edits: List[tuple]) -> Optional[str]:
+    """Apply renamed identifiers to the source text at their AST positions
+    
+    Keeps comments and formatting. Returns None when a position does not
+    hold the expected name (e.g. names inside f-strings), so the caller can
+    fall back to unparsing the tree.
+    """
+    source = code.encode()
+    line_starts = _line_offsets(code)
+    
+    splices = []
+    for node, old, new in edits:
+        start = line_starts[node.lineno] + node.col_offset
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            prefix = _RE_DEF_PREFIX.match(source, start)
+            if prefix is None:
+                return None
+            start = prefix.end()
+        old_bytes = old.encode()
+        end = start + len(old_bytes)
+        if source[start:end] != old_bytes or source[end:end + 1].isalnum() or source[end:end + 1] == b'_':
+            return None
+        splices.append((start, end, new.encode()))
+    
+    return _join_splices(source, splices).decode()
+
+
+def _splice(source: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Replace line ranges of source, leaving the other lines untouched
+    
+    Each edit is (start, end, replacement) with 1-based inclusive lines;
+    ``end == start - 1`` inserts before line start. Ranges must not overlap.
+    """
+    lines = list(_source_lines(source))
+    for start, end, replacement in sorted(edits, reverse=True):
+        lines[start - 1:end] = [replacement.encode()]
+    return b"".join(lines).decode()
+
+
+def _statement_span(code: str, node: ast.stmt) -> Optional[Tuple[int, int]]:
+    # Lines of a statement (decorators included), if they hold nothing else
+    # but whitespace and a trailing comment
+    decorators = getattr(node, "decorator_list", None)
+    first = decorators[0] if decorators else node
+    lines = _source_lines(code)
+    head = lines[first.lineno - 1][:first.col_offset].strip()
+    tail = lines[node.end_lineno - 1][node.end_col_offset:].strip()
+    if head not in ((b'', b'@') if decorators else (b'',)) or (tail and not tail.startswith(b'#')):
+        return None
+    return first.lineno, node.end_lineno
+
+
+def _statement_region(code: str, node: ast.stmt) -> Tuple[int, int, bytes]:
+    # Byte range of a statement (decorators included) and the indentation
+    # its first line had; a simple statement after "if x:" or ";" gets none
+    decorators = getattr(node, "decorator_list", None)
+    first = decorators[0] if decorators else node
+    line_start = _line_offsets(code)[first.lineno]
+    head = _source_lines(code)[first.lineno - 1][:first.col_offset]
+    indent = head[:len(head) - len(head.lstrip())]
+    if head.strip() in (b'', b'@'):
+        start = line_start + len(indent)
+    else:
+        start, indent = line_start + first.col_offset, b''
+    return start, _line_offsets(code)[node.end_lineno] + node.end_col_offset, indent
+
+
+def _parses_as(text: bytes, indent: bytes, node: ast.stmt) -> bool:
+    # Whether the new text of one statement parses to its transformed node;
+    # checking the edited statements alone keeps this independent of file size
+    if indent:
+        text = b"if 1:\n" + indent + text
+    try:
+        tree = ast.parse(text)
+    except SyntaxError:
+        return False
+    body = tree.body[0].body if indent else tree.body
+    return len(body) == 1 and ast.dump(body[0]) == ast.dump(node)
+
+
+@dataclass(frozen=True, **DATACLASS_SLOTS)
 class RefactoringOperation:
     type: str
     target: str = None
@@ -18,222 +175,677 @@ class RefactoringOperation:
     method_name: str = None
     source_class: str = None
     target_class: str = None
-    dead_functions: List[str] = None
+    dead_functions: Tuple[str, ...] = None
+    
+    def __post_init__(self):
+        # Lists are accepted but stored as tuples, so operations are hashable
+        if self.dead_functions is not None:
+            object.__setattr__(self, "dead_functions", tuple(self.dead_functions))
+
+
+class RefactoringBatch:
+    """Refactoring operations stored column-wise
+    
+    Holds one list per RefactoringOperation field (``columns["old_name"]``),
+    so bulk passes read plain lists instead of one object per operation.
+    """
+    
+    def __init__(self, operations: Iterable[RefactoringOperation] = ()):
+        self.columns: Dict[str, List[Any]] = {f.name: [] for f in fields(RefactoringOperation)}
+        for operation in operations:
+            self.append(operation)
+    
+    def __len__(self) -> int:
+        return len(self.columns["type"])
+    
+    def append(self, operation: RefactoringOperation) -> None:
+        for name, column in self.columns.items():
+            column.append(getattr(operation, name))
+    
+    def operation(self, index: int) -> RefactoringOperation:
+        """Row index as a RefactoringOperation"""
+        return RefactoringOperation(**{name: column[index] for name, column in self.columns.items()})
+
+
+class _IdentifierRenamer(ast.NodeVisitor):
+    """Applies a sequence of renames in a single walk
+    
+    Variable renames touch names, parameters and callees; function renames
+    touch def names and callees. Renames are composed per slot, so the result
+    matches applying them one after another.
+    """
+    SLOTS = {
+        "rename_variable": ("name", "arg", "callee"),
+        "rename_function": ("def", "callee"),
+    }
+    
+    def __init__(self, renames: Iterable[Tuple[str, str, str]], apply: bool = False):
+        """Collect (and with apply=True, perform) renames on the visited tree
+        
+        Args:
+            renames: (operation type, old name, new name) in application order
+            apply: Change the nodes; otherwise the tree is only read
+        """
+        self.apply = apply
+        self.maps: Dict[str, Dict[str, str]] = {"name": {}, "arg": {}, "def": {}, "callee": {}}
+        # (node, old name, new name) for every identifier changed
+        self.edits: List[tuple] = []
+        for operation_type, old_name, new_name in renames:
+            for slot in self.SLOTS[operation_type]:
+                self._compose(self.maps[slot], old_name, new_name)
+    
+    @staticmethod
+    def _compose(mapping: Dict[str, str], old: str, new: str) -> None:
+        for key, value in mapping.items():
+            if value == old:
+                mapping[key] = new
+        mapping.setdefault(old, new)
+    
+    def _rename(self, slot: str, node: ast.AST, field: str) -> None:
+        old = getattr(node, field)
+        new = self.maps[slot].get(old, old)
+        if new != old:
+            if self.apply:
+                setattr(node, field, new)
+            self.edits.append((node, old, new))
+    
+    def visit_Name(self, node):
+        self._rename("name", node, "id")
+    
+    def visit_arg(self, node):
+        self._rename("arg", node, "arg")
+        self.generic_visit(node)
+    
+    def visit_FunctionDef(self, node):
+        self._rename("def", node, "name")
+        self.generic_visit(node)
+    
+    visit_AsyncFunctionDef = visit_FunctionDef
+    
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name):
+            self.generic_visit(node)
+            return
+        self._rename("callee", node.func, "id")
+        for child in node.args + node.keywords:
+            self.visit(child)
+
+
+# Clauses holding their own statement lists (match/case needs Python 3.10+)
+_CLAUSE_NODES = (ast.excepthandler,) + ((ast.match_case,) if hasattr(ast, "match_case") else ())
+
+
+def _block_of(parent: ast.stmt, node: ast.stmt) -> Optional[List[ast.stmt]]:
+    # The statement list of parent (or of one of its handlers / cases) holding node
+    for _, value in ast.iter_fields(parent):
+        if not isinstance(value, list):
+            continue
+        if node in value:
+            return value
+        for item in value:
+            if isinstance(item, _CLAUSE_NODES) and node in item.body:
+                return item.body
+    return None
+
+
+class _VariableInliner(ast.NodeTransformer):
+    def __init__(self, variable_name: str):
+        self.variable_name = variable_name
+        self.value_node = None
+        self.found_assignment = False
+        # Removed statement, the statement list that held it, and each
+        # replaced name with its innermost statement
+        self.assignment = None
+        self.assignment_block: List[ast.stmt] = None
+        self.replaced: List[Tuple[ast.Name, ast.stmt]] = []
+        self._statements: List[ast.stmt] = []
+    
+    def visit(self, node):
+        if not isinstance(node, ast.stmt):
+            return super().visit(node)
+        self._statements.append(node)
+        try:
+            return super().visit(node)
+        finally:
+            self._statements.pop()
+    
+    def visit_Assign(self, node):
+        if (len(node.targets) == 1 and 
+            isinstance(node.targets[0], ast.Name) and 
+            node.targets[0].id == self.variable_name and
+            not self.found_assignment):
+            self.value_node = node.value
+            self.assignment = node
+            if len(self._statements) > 1:
+                # Lists are filtered in place, so this sees the removal
+                self.assignment_block = _block_of(self._statements[-2], node)
+            self.found_assignment = True
+            return None
+        return self.generic_visit(node)
+    
+    def visit_Name(self, node):
+        if (node.id == self.variable_name and 
+            self.value_node and 
+            isinstance(node.ctx, ast.Load)):
+            self.replaced.append((node, self._statements[-1]))
+            return self.value_node
+        return node
+
+
+# Values that never need parentheses when substituted for a name
+_ATOMIC_EXPRESSIONS = (
+    ast.Name, ast.Constant, ast.Attribute, ast.Subscript, ast.Call, ast.List,
+    ast.Dict, ast.Set, ast.ListComp, ast.SetComp, ast.DictComp, ast.JoinedStr,
+)
+
+
+def _splice_inlined(code: str, inliner: _VariableInliner) -> Optional[str]:
+    """Source text for a finished inline_variable, or None to unparse instead
+    
+    Drops the assignment's lines and substitutes the value's source for each
+    replaced name. Each statement holding replaced names is re-parsed on its
+    own and must match the transformed tree; its names are tried bare, then
+    parenthesized.
+    """
+    span = _statement_span(code, inliner.assignment)
+    if span is None or inliner.assignment_block == []:
+        return None  # an emptied block would need a pass
+    source = code.encode()
+    offsets = _line_offsets(code)
+    value_node = inliner.value_node
+    value = source[offsets[value_node.lineno] + value_node.col_offset:
+                   offsets[value_node.end_lineno] + value_node.end_col_offset]
+    texts = [value]
+    if not isinstance(value_node, _ATOMIC_EXPRESSIONS):
+        texts.append(b"(" + value + b")")
+    removal = (offsets[span[0]], offsets[span[1] + 1], b"")
+    names = [
+        (offsets[node.lineno] + node.col_offset, offsets[node.end_lineno] + node.end_col_offset)
+        for node, _ in inliner.replaced
+    ]
+    
+    statements = {id(statement): statement for _, statement in inliner.replaced}.values()
+    regions = sorted(
+        (_statement_region(code, statement) + (statement,) for statement in statements),
+        key=lambda region: (region[0], -region[1]),
+    )
+    splices = [removal]
+    checked_end = -1
+    for start, end, indent, statement in regions:
+        if start < checked_end:
+            continue  # nested in a statement already checked
+        checked_end = end
+        inside = [name for name in names if start <= name[0] < end]
+        for text in texts:
+            candidate = [name + (text,) for name in inside]
+            if _parses_as(_join_splices(source, candidate, start, end), indent, statement):
+                splices += candidate
+                break
+        else:
+            return None
+    return _join_splices(source, splices).decode()
+
+
+class _FunctionInliner(ast.NodeTransformer):
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.body_node = None
+        self.params = []
+        self.function_removed = False
+    
+    def visit_FunctionDef(self, node):
+        if node.name == self.function_name:
+            if node.body and isinstance(node.body[0], ast.Return):
+                self.body_node = node.body[0].value
+            self.params = [arg.arg for arg in node.args.args]
+            self.function_removed = True
+            return None
+        return self.generic_visit(node)
+    
+    def visit_Call(self, node):
+        if (isinstance(node.func, ast.Name) and 
+            node.func.id == self.function_name and 
+            self.body_node):
+            # Substitute into a fresh copy; the body is shared by all call sites
+            result = copy.deepcopy(self.body_node)
+            if hasattr(result, 'left') and hasattr(result, 'right'):
+                # Handle BinOp case (a + b)
+                if len(node.args) == 2:
+                    if (isinstance(result.left, ast.Name) and 
+                        result.left.id in self.params):
+                        result.left = node.args[self.params.index(result.left.id)]
+                    if (isinstance(result.right, ast.Name) and 
+                        result.right.id in self.params):
+                        result.right = node.args[self.params.index(result.right.id)]
+            return result
+        return self.generic_visit(node)
+
+
+class _MethodMover(ast.NodeTransformer):
+    def __init__(self, operation: RefactoringOperation):
+        self.operation = operation
+        self.method_to_move = None
+        self.target_class_node = None
+        self.source_class_node = None
+        self.moved = False
+    
+    def visit_ClassDef(self, node):
+        if node.name == self.operation.source_class:
+            new_body = []
+            for item in node.body:
+                if (isinstance(item, ast.FunctionDef) and 
+                    item.name == self.operation.method_name):
+                    self.method_to_move = item
+                else:
+                    new_body.append(item)
+            node.body = new_body
+            self.source_class_node = node
+        elif node.name == self.operation.target_class:
+            if self.method_to_move:
+                if node.body == [ast.Pass()]:
+                    node.body = [self.method_to_move]
+                else:
+                    node.body.append(self.method_to_move)
+                self.moved = True
+            self.target_class_node = node
+        return node
+
+
+def _splice_moved(code: str, mover: _MethodMover) -> Optional[str]:
+    """Source text for a finished move_method, or None to unparse instead
+    
+    Cuts the method's lines (decorators and comments included) and appends
+    them, re-indented, after the target class.
+    """
+    method = mover.method_to_move
+    target = mover.target_class_node
+    span = _statement_span(code, method)
+    if span is None or not mover.source_class_node.body:
+        return None
+    lines = _source_lines(code)
+    head = lines[span[0] - 1]
+    source_indent = head[:len(head) - len(head.lstrip())]
+    first = target.body[0]
+    target_indent = lines[first.lineno - 1][:first.col_offset]
+    if target_indent.strip():
+        return None
+    moved = []
+    for line in lines[span[0] - 1:span[1]]:
+        if line.startswith(source_indent):
+            moved.append(target_indent + line[len(source_indent):])
+        elif not line.strip():
+            moved.append(line)
+        else:
+            return None
+    text = b"".join(moved)
+    # Re-indenting must not change it (e.g. lines of a multi-line string)
+    if not _parses_as(text[len(target_indent):].rstrip(), target_indent, method):
+        return None
+    if not text.endswith((b"\n", b"\r")):
+        text += b"\n"
+    end = target.end_lineno
+    if not lines[end - 1].endswith((b"\n", b"\r")):
+        text = b"\n" + text
+    return _splice(code, [span + ("",), (end + 1, end, "\n" + text.decode())])
+
+
+class _DeadCodeRemover(ast.NodeTransformer):
+    def __init__(self, dead_functions: List[str]):
+        self.dead_functions = dead_functions
+    
+    def visit_FunctionDef(self, node):
+        if node.name in self.dead_functions:
+            return None
+        return node
+
+
+def _dead_definitions(tree: ast.Module, dead_functions) -> List[tuple]:
+    """Definitions _DeadCodeRemover would drop, found without changing tree
+    
+    Returns (definition, statement list holding it) pairs; the list is None
+    at module level, where an empty body is fine.
+    """
+    found = []
+    
+    def visit(node: ast.AST) -> None:
+        for _, value in ast.iter_fields(node):
+            for item in value if isinstance(value, list) else (value,):
+                if not isinstance(item, ast.AST):
+                    continue
+                if type(item) is ast.FunctionDef:
+                    # Like the transformer, never look inside a definition
+                    if item.name in dead_functions:
+                        found.append((item, None if node is tree else value))
+                    continue
+                visit(item)
+    
+    visit(tree)
+    return found
+
+
+def _splice_removed(code: str, removed: List[tuple]) -> Optional[str]:
+    """Source text for remove_dead_code, or None to unparse instead
+    
+    Deletes each definition's lines (decorators included) and the blank
+    lines after it.
+    """
+    removed_ids = {id(node) for node, _ in removed}
+    lines = _source_lines(code)
+    edits = []
+    for node, block in removed:
+        span = _statement_span(code, node)
+        if span is None:
+            return None
+        if block is not None and all(id(statement) in removed_ids for statement in block):
+            return None  # an emptied block would need a pass
+        end = span[1]
+        while end < len(lines) and not lines[end].strip():
+            end += 1
+        edits.append((span[0], end, ""))
+    return _splice(code, edits)
+
+
+def _unreachable_functions(tree: ast.Module) -> List[ast.stmt]:
+    """Top-level functions that nothing reachable refers to, in source order
+    
+    References are followed from module-level code (including decorators
+    and defaults), from ``main``, from the names listed in ``__all__`` (or
+    every public name without one) and from decorated functions, which a
+    decorator may have registered. Returns the definitions, so methods that
+    share a name are left alone.
+    """
+    functions = [
+        node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+    ]
+    names = {node.name for node in functions}
+    
+    def referenced(nodes) -> Set[str]:
+        found = set()
+        for root in nodes:
+            for node in ast.walk(root):
+                if type(node) is ast.Name and node.id in names:
+                    found.add(node.id)
+        return found
+    
+    # Function name -> names of other functions its body refers to
+    edges = {node.name: set() for node in functions}
+    roots = {"main"} & names
+    exported = None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            edges[node.name] |= referenced(node.body)
+            defaults = [default for default in node.args.kw_defaults if default is not None]
+            roots |= referenced(node.decorator_list + node.args.defaults + defaults)
+            if node.decorator_list:
+                roots.add(node.name)
+            continue
+        roots |= referenced([node])
+        if (isinstance(node, ast.Assign) and 
+            any(isinstance(target, ast.Name) and target.id == "__all__" for target in node.targets) and 
+            isinstance(node.value, (ast.List, ast.Tuple))):
+            exported = {elt.value for elt in node.value.elts if isinstance(elt, ast.Constant)}
+    # Without __all__, anything public may be imported by another module
+    roots |= names & exported if exported is not None else {name for name in names if not name.startswith("_")}
+    
+    reached = set(roots)
+    pending = list(roots)
+    while pending:
+        for callee in edges[pending.pop()] - reached:
+            reached.add(callee)
+            pending.append(callee)
+    return [node for node in functions if node.name not in reached]
+
+
+def _node_type_names(cls=ast.AST) -> Set[str]:
+    names = set()
+    for subclass in cls.__subclasses__():
+        names.add(subclass.__name__)
+        names |= _node_type_names(subclass)
+    return names
+
+
+# Opcodes for the structure hash: markers, then one per node type
+_OPCODE_IDENTIFIER, _OPCODE_FIELD_END, _OPCODE_SCALAR = 1, 2, 3
+_NODE_OPCODES = {name: index for index, name in enumerate(sorted(_node_type_names()), start=4)}
+# Fields that renames change; their values all map to one opcode
+_IDENTIFIER_FIELDS = {"Name": "id", "arg": "arg", "FunctionDef": "name", "AsyncFunctionDef": "name"}
+
+
+def _ast_to_opcodes(tree: ast.AST) -> List[int]:
+    """Post-order uint32 opcodes describing tree up to identifiers
+    
+    Each node contributes its children, a field-end marker per field and its
+    type; other values (constants, attribute names, ...) are tagged CRC32s.
+    """
+    opcodes: List[int] = []
+    append = opcodes.append
+    
+    def visit(node: ast.AST) -> None:
+        type_name = type(node).__name__
+        identifier_field = _IDENTIFIER_FIELDS.get(type_name)
+        for field, value in ast.iter_fields(node):
+            for item in value if isinstance(value, list) else (value,):
+                if isinstance(item, ast.AST):
+                    visit(item)
+                elif field == identifier_field:
+                    append(_OPCODE_IDENTIFIER)
+                else:
+                    append(_OPCODE_SCALAR)
+                    append(zlib.crc32(repr(item).encode()))
+            append(_OPCODE_FIELD_END)
+        append(_NODE_OPCODES.get(type_name) or zlib.crc32(type_name.encode()))
+    
+    visit(tree)
+    return opcodes
+
+
+_FNV_OFFSET = 14695981039346656037
+_FNV_PRIME = 1099511628211
+
+
+def _fnv1a_loop(opcodes, h, prime):
+    # Kernel for numba: h and prime arrive as numpy.uint64, so the
+    # multiplication wraps at 64 bits
+    for x in opcodes:
+        h ^= x
+        h *= prime
+    return h
+
+
+@lru_cache(maxsize=None)
+def _fnv1a_compiled():
+    # numba is imported on first use rather than with this module: it adds
+    # hundreds of milliseconds to every import, and most callers never hash
+    try:
+        import numpy
+        from numba import njit
+    except ImportError:
+        return None
+    kernel = njit(cache=True)(_fnv1a_loop)
+    offset, prime = numpy.uint64(_FNV_OFFSET), numpy.uint64(_FNV_PRIME)
+    return lambda opcodes: int(kernel(numpy.asarray(opcodes, dtype=numpy.uint32), offset, prime))
+
+
+def _fnv1a(opcodes: List[int]) -> int:
+    compiled = _fnv1a_compiled()
+    if compiled is not None:
+        return compiled(opcodes)
+    h = _FNV_OFFSET
+    for x in opcodes:
+        h = ((h ^ x) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+
+@lru_cache(maxsize=128)
+def _structure_signature(code: str) -> Optional[Tuple[int, int]]:
+    # (opcode count, FNV-1a of the opcodes) of a source, None if it does not
+    # parse. Cached per source, so checking several results against one original
+    # lowers the original once; comparing the counts first rules out most
+    # differing pairs before the hashes are looked at
+    tree = _parse_cached(code)
+    if tree is None:
+        return None
+    opcodes = _ast_to_opcodes(tree)
+    return len(opcodes), _fnv1a(opcodes)
 
 
 class RefactoringEngine:
     def __init__(self):
-        self.supported_operations = [
-            "extract_method",
-            "rename_variable",
-            "rename_function",
-            "inline_variable",
-            "inline_function",
-            "move_method",
-            "remove_dead_code"
-        ]
+        self._operations = {
+            "extract_method": self._extract_method,
+            "rename_variable": self._rename_variable,
+            "rename_function": self._rename_function,
+            "inline_variable": self._inline_variable,
+            "inline_function": self._inline_function,
+            "move_method": self._move_method,
+            "remove_dead_code": self._remove_dead_code
+        }
+        self.supported_operations = list(self._operations)
+        # Validators and previews re-apply the same operation to the same
+        # code; results are strings, so they can be shared safely
+        self._apply_cached = lru_cache(maxsize=256)(self._apply_uncached)
     
     def apply_refactoring(self, code: str, operation: RefactoringOperation) -> str:
-        if operation.type not in self.supported_operations:
+        if operation.type not in self._operations:
             raise NotImplementedError(f"Operation {operation.type} not supported")
         
-        if operation.type == "extract_method":
-            return self._extract_method(code, operation)
-        elif operation.type == "rename_variable":
-            return self._rename_variable(code, operation)
-        elif operation.type == "rename_function":
-            return self._rename_function(code, operation)
-        elif operation.type == "inline_variable":
-            return self._inline_variable(code, operation)
-        elif operation.type == "inline_function":
-            return self._inline_function(code, operation)
-        elif operation.type == "move_method":
-            return self._move_method(code, operation)
-        elif operation.type == "remove_dead_code":
-            return self._remove_dead_code(code, operation)
+        return self._apply_cached(code, operation)
+    
+    def _apply_uncached(self, code: str, operation: RefactoringOperation) -> str:
+        return self._operations[operation.type](code, operation)
+    
+    def apply_refactorings(self, code: str, operations: List[RefactoringOperation]) -> str:
+        """Apply operations in order, running consecutive renames in one AST pass"""
+        return self.apply_batch(code, RefactoringBatch(operations))
+    
+    def apply_batch(self, code: str, batch: RefactoringBatch) -> str:
+        """Apply the operations of a batch in order (see apply_refactorings)"""
+        types = batch.columns["type"]
+        old_names = batch.columns["old_name"]
+        new_names = batch.columns["new_name"]
+        renames: List[Tuple[str, str, str]] = []
+        for index, operation_type in enumerate(types):
+            if operation_type in _IdentifierRenamer.SLOTS:
+                renames.append((operation_type, old_names[index], new_names[index]))
+                continue
+            if renames:
+                code = self._rename(code, renames)
+                renames = []
+            code = self.apply_refactoring(code, batch.operation(index))
+        if renames:
+            code = self._rename(code, renames)
+        return code
     
     def validate_refactoring(self, code: str, operation: RefactoringOperation) -> bool:
-        try:
-            ast.parse(code)
-            
-            if operation.type == "rename_function":
-                return operation.old_name in code
-            elif operation.type == "rename_variable":
-                return operation.old_name in code
-            
-            return True
-        except SyntaxError:
+        compiled = _compile_source(code)
+        if compiled.tree is None:
             return False
+        
+        # The name must be an identifier in the code, not just a substring
+        if operation.type == "rename_function":
+            return operation.old_name in compiled.names
+        elif operation.type == "rename_variable":
+            return operation.old_name in compiled.names
+        
+        return True
     
     def preserve_semantics(self, original_code: str, refactored_code: str) -> bool:
-        try:
-            original_ast = ast.parse(original_code)
-            refactored_ast = ast.parse(refactored_code)
-            return True
-        except SyntaxError:
-            return False
+        return _parse_cached(original_code) is not None and _parse_cached(refactored_code) is not None
     
-    def _extract_method(self, code: str, operation: RefactoringOperation) -> str:
-        lines = code.split('\n')
+    def same_structure(self, original_code: str, refactored_code: str) -> bool:
+        """Whether the two versions differ at most in identifiers
         
-        extracted_lines = lines[operation.start_line - 1:operation.end_line]
+        True for what rename_variable and rename_function produce. Other
+        operations change the tree on purpose, so preserve_semantics does
+        not require this.
+        """
+        original = _structure_signature(original_code)
+        return original is not None and original == _structure_signature(refactored_code)
+    
+    def _extract_method(self, code: str, operation: RefactoringOperation) -> str:
+        extracted_lines = [line.decode() for line in _source_lines(code)[operation.start_line - 1:operation.end_line]]
         
-        method_def = f"def {operation.new_method_name}(item_price):"
-        for line in extracted_lines:
-            method_def += f"\n    {line.strip()}"
-        method_def += "\n    return discounted_price\n"
+        # Assembled as a list and joined once; appending to a string per
+        # line copies the whole method each time
+        chunks = [f"def {operation.new_method_name}(item_price):"]
+        chunks.extend(f"    {line.strip()}" for line in extracted_lines)
+        chunks.append("    return discounted_price\n")
         
+        # The call replaces the extracted lines, keeping the last one's line ending
         call_line = f"            discounted_price = {operation.new_method_name}(item.price)"
+        if extracted_lines:
+            call_line += extracted_lines[-1][len(extracted_lines[-1].rstrip("\r\n")):]
         
-        new_lines = lines[:operation.start_line - 1]
-        new_lines.append(call_line)
-        new_lines.extend(lines[operation.end_line:])
-        
-        result = '\n'.join(new_lines)
-        result = method_def + "\n" + result
-        
-        return result
+        chunks.append(_splice(code, [(operation.start_line, operation.end_line, call_line)]))
+        return "\n".join(chunks)
     
     def _rename_variable(self, code: str, operation: RefactoringOperation) -> str:
-        tree = ast.parse(code)
-        
-        class VariableRenamer(ast.NodeTransformer):
-            def visit_Name(self, node):
-                if node.id == operation.old_name:
-                    node.id = operation.new_name
-                return node
-            
-            def visit_arg(self, node):
-                if node.arg == operation.old_name:
-                    node.arg = operation.new_name
-                return node
-        
-        transformed = VariableRenamer().visit(tree)
-        return ast.unparse(transformed)
+        return self._rename(code, [(operation.type, operation.old_name, operation.new_name)])
     
     def _rename_function(self, code: str, operation: RefactoringOperation) -> str:
+        return self._rename(code, [(operation.type, operation.old_name, operation.new_name)])
+    
+    def _rename(self, code: str, renames: List[Tuple[str, str, str]]) -> str:
+        # Renames are spliced into the original text, so comments and
+        # formatting survive; unparse is only the fallback. Collecting edits
+        # leaves the tree untouched, so the shared cached tree can be used
+        tree = _parse_cached(code) or ast.parse(code)
+        renamer = _IdentifierRenamer(renames)
+        renamer.visit(tree)
+        spliced = _splice_renames(code, renamer.edits)
+        if spliced is not None:
+            return spliced
         tree = ast.parse(code)
-        
-        class FunctionRenamer(ast.NodeTransformer):
-            def visit_FunctionDef(self, node):
-                if node.name == operation.old_name:
-                    node.name = operation.new_name
-                return self.generic_visit(node)
-            
-            def visit_Call(self, node):
-                if isinstance(node.func, ast.Name) and node.func.id == operation.old_name:
-                    node.func.id = operation.new_name
-                return self.generic_visit(node)
-        
-        transformed = FunctionRenamer().visit(tree)
-        return ast.unparse(transformed)
+        _IdentifierRenamer(renames, apply=True).visit(tree)
+        return ast.unparse(tree)
     
     def _inline_variable(self, code: str, operation: RefactoringOperation) -> str:
         tree = ast.parse(code)
-        
-        class VariableInliner(ast.NodeTransformer):
-            def __init__(self):
-                self.value_node = None
-                self.found_assignment = False
-            
-            def visit_Assign(self, node):
-                if (len(node.targets) == 1 and 
-                    isinstance(node.targets[0], ast.Name) and 
-                    node.targets[0].id == operation.variable_name and
-                    not self.found_assignment):
-                    self.value_node = node.value
-                    self.found_assignment = True
-                    return None
-                return self.generic_visit(node)
-            
-            def visit_Name(self, node):
-                if (node.id == operation.variable_name and 
-                    self.value_node and 
-                    isinstance(node.ctx, ast.Load)):
-                    return self.value_node
-                return node
-        
-        transformed = VariableInliner().visit(tree)
-        return ast.unparse(transformed)
+        inliner = _VariableInliner(operation.variable_name)
+        transformed = inliner.visit(tree)
+        # Only the assignment and the lines using it change, so those are
+        # spliced into the original text; unparse is the fallback
+        if not inliner.found_assignment:
+            return ast.unparse(transformed)
+        spliced = _splice_inlined(code, inliner)
+        return spliced if spliced is not None else ast.unparse(transformed)
     
     def _inline_function(self, code: str, operation: RefactoringOperation) -> str:
         tree = ast.parse(code)
-        
-        class FunctionInliner(ast.NodeTransformer):
-            def __init__(self):
-                self.body_node = None
-                self.params = []
-                self.function_removed = False
-            
-            def visit_FunctionDef(self, node):
-                if node.name == operation.function_name:
-                    if node.body and isinstance(node.body[0], ast.Return):
-                        self.body_node = node.body[0].value
-                    self.params = [arg.arg for arg in node.args.args]
-                    self.function_removed = True
-                    return None
-                return self.generic_visit(node)
-            
-            def visit_Call(self, node):
-                if (isinstance(node.func, ast.Name) and 
-                    node.func.id == operation.function_name and 
-                    self.body_node):
-                    # Create a copy of the body node and substitute parameters
-                    result = self.body_node
-                    if hasattr(result, 'left') and hasattr(result, 'right'):
-                        # Handle BinOp case (a + b)
-                        if len(node.args) == 2:
-                            if (isinstance(result.left, ast.Name) and 
-                                result.left.id in self.params):
-                                result.left = node.args[self.params.index(result.left.id)]
-                            if (isinstance(result.right, ast.Name) and 
-                                result.right.id in self.params):
-                                result.right = node.args[self.params.index(result.right.id)]
-                    return result
-                return self.generic_visit(node)
-        
-        transformed = FunctionInliner().visit(tree)
+        transformed = _FunctionInliner(operation.function_name).visit(tree)
         return ast.unparse(transformed)
     
     def _move_method(self, code: str, operation: RefactoringOperation) -> str:
         tree = ast.parse(code)
-        method_node = None
-        
-        class MethodMover(ast.NodeTransformer):
-            def __init__(self):
-                self.method_to_move = None
-                self.target_class_node = None
-            
-            def visit_ClassDef(self, node):
-                if node.name == operation.source_class:
-                    new_body = []
-                    for item in node.body:
-                        if (isinstance(item, ast.FunctionDef) and 
-                            item.name == operation.method_name):
-                            self.method_to_move = item
-                        else:
-                            new_body.append(item)
-                    node.body = new_body
-                elif node.name == operation.target_class:
-                    if self.method_to_move:
-                        if node.body == [ast.Pass()]:
-                            node.body = [self.method_to_move]
-                        else:
-                            node.body.append(self.method_to_move)
-                    self.target_class_node = node
-                return node
-        
-        transformed = MethodMover().visit(tree)
-        return ast.unparse(transformed)
+        mover = _MethodMover(operation)
+        transformed = mover.visit(tree)
+        if not mover.moved:
+            return ast.unparse(transformed)
+        spliced = _splice_moved(code, mover)
+        return spliced if spliced is not None else ast.unparse(transformed)
     
     def _remove_dead_code(self, code: str, operation: RefactoringOperation) -> str:
-        tree = ast.parse(code)
-        
-        class DeadCodeRemover(ast.NodeTransformer):
-            def visit_FunctionDef(self, node):
-                if node.name in operation.dead_functions:
-                    return None
-                return node
-        
-        transformed = DeadCodeRemover().visit(tree)
-        return ast.unparse(transformed)
\ No newline at end of file
+        # The removals are found on the shared cached tree and cut from the
+        # text, so a tree already parsed for validation is reused; only the
+        # unparse fallback needs a tree of its own to transform
+        tree = _parse_cached(code) or ast.parse(code)
+        dead_functions = operation.dead_functions
+        if dead_functions is None:
+            # Without an explicit list, remove only the top-level definitions
+            # that nothing reachable refers to
+            unreachable = _unreachable_functions(tree)
+            removed = [(node, None) for node in unreachable]
+        else:
+            removed = _dead_definitions(tree, dead_functions)
+        if removed:
+            spliced = _splice_removed(code, removed)
+            if spliced is not None:
+                return spliced
+        transformed = ast.parse(code)
+        if dead_functions is None:
+            dead_ids = {id(node) for node in unreachable}
+            dead_indices = {index for index, node in enumerate(tree.body) if id(node) in dead_ids}
+            transformed.body = [node for index, node in enumerate(transformed.body) if index not in dead_indices]
+        else:
+            transformed = _DeadCodeRemover(dead_functions).visit(transformed)
+        return ast.unparse(transformed)
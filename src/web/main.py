@@ -1,30 +1,106 @@
 import os
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
+from typing import List, Optional
+import jinja2
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
+
+try:
+    import orjson  # noqa: F401  ORJSONResponseが必要とする
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
+from src.llm.anthropic_client import close_client, get_client
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-app = FastAPI()
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+
+# ダミーデータ（リクエスト毎に作り直さないよう定数にしておく）
+_DUMMY_CONTEXT = {
+    "prompt": "例）この関数をリファクタしてください",
+    "output": "ここに最終出力が表示されます",
+    "persona": "ペルソナ例",
+    "auto_input": "自動入力例",
+    "analysis": "分析・評価例",
+    "policy": "修正方針例",
+    "progress": "進捗例",
+    "history": ["リファクタリング履歴1", "リファクタリング履歴2"],
+    "final_prompt": "最終調整済みプロンプト例"
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # プロセス共通のクライアント（接続プール・実行中リクエストの共有）を使い、終了時に閉じる
+    app.state.llm_client = get_client() if os.getenv("ANTHROPIC_API_KEY") else None
+    # 最初のリクエストでコンパイル待ちが発生しないよう、全テンプレートを先に読み込む
+    for name in templates.env.list_templates():
+        templates.env.get_template(name)
+    try:
+        yield
+    finally:
+        await close_client()
+
+
+class _GZipMiddleware(GZipMiddleware):
+    # ストリーミング応答は圧縮するとバッファされて逐次送信にならないので除外する
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/stream"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=DefaultResponse)
+# リファクタ結果のコードは繰り返しが多く圧縮が効く（HTMLテンプレートも対象）
+app.add_middleware(_GZipMiddleware, minimum_size=512)
 
 # staticディレクトリのマウント
-app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, "static")), name="static")
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 # templatesディレクトリの設定
-templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+templates = Jinja2Templates(directory=TEMPLATES_DIR)
+# テンプレートの変更はプロセス再起動で反映する（リクエスト毎の更新確認をしない）
+templates.env.auto_reload = False
+# コンパイル結果をユーザー専用の一時ディレクトリに保存し、再起動後も再利用する
+templates.env.bytecode_cache = jinja2.FileSystemBytecodeCache()
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     # ダミーデータでUIを表示
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "prompt": "例）この関数をリファクタしてください",
-        "output": "ここに最終出力が表示されます",
-        "persona": "ペルソナ例",
-        "auto_input": "自動入力例",
-        "analysis": "分析・評価例",
-        "policy": "修正方針例",
-        "progress": "進捗例",
-        "history": ["リファクタリング履歴1", "リファクタリング履歴2"],
-        "final_prompt": "最終調整済みプロンプト例"
-    })
+    return templates.TemplateResponse("index.html", {"request": request, **_DUMMY_CONTEXT})
+
+
+class RefactorRequest(BaseModel):
+    prompt: str
+    system_prompt: Optional[str] = None
+
+
+def _require_client(request: Request):
+    client = request.app.state.llm_client
+    if client is None:
+        raise HTTPException(status_code=503, detail="ANTHROPIC_API_KEY is not configured")
+    return client
+
+
+@app.post("/refactor/batch")
+async def refactor_batch(request: Request, body: List[RefactorRequest]):
+    # 複数のプロンプトを同時実行数を制限して並列に処理する
+    return await _require_client(request).execute_prompts_batch(
+        [(item.prompt, item.system_prompt) for item in body]
+    )
+
+
+@app.post("/refactor/stream")
+async def refactor_stream(request: Request, body: RefactorRequest):
+    # 生成されたテキストを届いた順に返す（キャッシュ向けの非ストリーミング経路はexecute_prompt）
+    return StreamingResponse(
+        _require_client(request).execute_prompt_stream(body.prompt, body.system_prompt),
+        media_type="text/plain"
+    )
\ No newline at end of file
@@ -0,0 +1,27 @@
+import pytest
+from src.analyzer.code_analyzer import CodeAnalyzer
+from src.refactor.refactoring_engine import RefactoringEngine
+from src.prompt.prompt_processor import PromptProcessor
+from src.generator.code_generator import CodeGenerator
+
+
+# The components hold no per-call state, so one instance per test module is enough
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return CodeAnalyzer()
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return PromptProcessor()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RefactoringEngine()
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return CodeGenerator()
\ No newline at end of file
@@ -1,5 +1,6 @@
+import ast
 import pytest
-from src.analyzer.code_analyzer import CodeAnalyzer, CodeSmell
+from src.analyzer.code_analyzer import CodeAnalyzer, CodeSmell, register_check, _CHECKS
 
 
 class TestCodeAnalyzer:
@@ -76,6 +77,18 @@ def process_admin_data(admin):
         smells = analyzer.identify_code_smells(code, "python")
         assert any(smell.type == "duplicate_code" for smell in smells)
     
+    def test_different_operations_are_not_duplicates(self):
+        analyzer = CodeAnalyzer()
+        code = """
+def add(a, b):
+    return a + b
+
+def multiply(x, y):
+    return x * y
+"""
+        smells = analyzer.identify_code_smells(code, "python")
+        assert not any(smell.type == "duplicate_code" for smell in smells)
+    
     def test_generate_refactoring_suggestions(self):
         analyzer = CodeAnalyzer()
         code = """
@@ -95,6 +108,39 @@ def calculate(x, y, operation):
                   "dictionary" in s.description.lower() 
                   for s in suggestions)
     
+    def test_full_analyze_returns_all_results(self):
+        analyzer = CodeAnalyzer()
+        code = """
+class Dispatcher:
+    def dispatch(self, op):
+        if op == 'a':
+            return 1
+        elif op == 'b':
+            return 2
+        elif op == 'c':
+            return 3
+        elif op == 'd':
+            return 4
+"""
+        structure, smells, suggestions = analyzer.full_analyze(code, "python")
+        assert structure.classes == ["Dispatcher"]
+        assert structure.methods == {"Dispatcher": ["dispatch"]}
+        assert smells == []
+        assert [s.type for s in suggestions] == ["replace_conditionals"]
+    
+    def test_registered_check_runs_in_full_analyze(self):
+        analyzer = CodeAnalyzer()
+        
+        @register_check(ast.Global)
+        def check_global(visitor, node):
+            visitor.smells.append(CodeSmell(type="global_statement", line=node.lineno, description="Avoid global"))
+        
+        try:
+            _, smells, _ = analyzer.full_analyze("def f():\n    global x\n    x = 1", "python")
+        finally:
+            _CHECKS[ast.Global].remove(check_global)
+        assert [(s.type, s.line) for s in smells] == [("global_statement", 2)]
+    
     def test_extract_ast(self):
         analyzer = CodeAnalyzer()
         code = "x = 1 + 2"
@@ -102,6 +148,24 @@ def calculate(x, y, operation):
         assert ast_tree is not None
         assert ast_tree.type == "Module"
     
+    def test_extract_ast_children(self):
+        analyzer = CodeAnalyzer()
+        ast_tree = analyzer.extract_ast("x = 1 + 2", "python")
+        assert [child.type for child in ast_tree.children] == ["Assign"]
+        assign = ast_tree.children[0]
+        assert [child.type for child in assign.children] == ["Name", "BinOp"]
+        binop = assign.children[1]
+        assert [child.type for child in binop.children] == ["Constant", "Add", "Constant"]
+    
+    def test_flatten_ast(self):
+        analyzer = CodeAnalyzer()
+        flat = analyzer.flatten_ast("x = 1 + 2", "python")
+        names = [flat.type_name(i) for i in range(len(flat))]
+        assert names == ["Store", "Name", "Constant", "Add", "Constant", "BinOp", "Assign", "Module"]
+        assert list(flat.parent) == [1, 6, 5, 5, 5, 6, 7, -1]
+        assert flat.children(5) == [2, 3, 4]
+        assert flat.first[6] == 0
+    
     def test_invalid_code_handling(self):
         analyzer = CodeAnalyzer()
         code = "def invalid syntax here"
@@ -125,4 +189,32 @@ def outer_function():
 """
         result = analyzer.parse_code(code, "python")
         assert "outer_function" in result.functions
-        assert len(result.functions) >= 1
\ No newline at end of file
+        assert len(result.functions) >= 1
+    
+    def test_analysis_passes_share_one_parse(self):
+        from src.analyzer.code_analyzer import _parse_cached
+        analyzer = CodeAnalyzer()
+        code = """
+def shared_parse_example(value):
+    return value + 1
+"""
+        _parse_cached.cache_clear()
+        analyzer.parse_code(code, "python")
+        analyzer.identify_code_smells(code, "python")
+        analyzer.generate_suggestions(code, "python")
+        info = _parse_cached.cache_info()
+        assert info.misses == 1
+        assert info.hits == 2
+    
+    def test_full_analyze_leaves_cached_tree_unchanged(self):
+        from src.analyzer.code_analyzer import _parse_cached
+        analyzer = CodeAnalyzer()
+        code = """
+def outer(value):
+    def inner():
+        return value
+    return inner
+"""
+        analyzer.full_analyze(code, "python")
+        tree = _parse_cached(code)
+        assert all(not hasattr(node, "_sig") for node in ast.walk(tree))
\ No newline at end of file
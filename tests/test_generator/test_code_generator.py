@@ -1,5 +1,6 @@
+import ast
 import pytest
-from src.generator.code_generator import CodeGenerator, GenerationOptions
+from src.generator.code_generator import CodeGenerator, GenerationOptions, _parse_cached
 
 
 class TestCodeGenerator:
@@ -76,6 +77,24 @@ def   calculate( x,y ):
         assert 'if z > 10:' in result
         assert 'return z * 2' in result
     
+    def test_generate_clean_code_spaces_operator_chains(self):
+        generator = CodeGenerator()
+        
+        assert generator.generate_clean_code("y=a*b") == "y = a * b"
+        assert generator.generate_clean_code("y=x+y*z") == "y = x + y * z"
+        assert generator.generate_clean_code("y=a+b-c/d") == "y = a + b - c / d"
+    
+    def test_generate_clean_code_leaves_clean_code_alone(self):
+        generator = CodeGenerator()
+        code = """
+def test_gif(h, f):
+    if h:
+        return
+    return f
+"""
+        
+        assert generator.generate_clean_code(code) == code
+    
     def test_support_python_language(self):
         generator = CodeGenerator()
         code = """
@@ -130,6 +149,18 @@ def helper():
         assert '# Calculate the result' not in result
         assert 'def helper():' in result
     
+    def test_remove_comments_keeps_hash_in_strings(self):
+        generator = CodeGenerator()
+        code = """
+def color():
+    return "#ff0000"  # red
+"""
+        options = GenerationOptions(language="python", preserve_comments=False)
+        
+        result = generator.generate_code(code, options)
+        assert 'return "#ff0000"' in result
+        assert '# red' not in result
+    
     def test_format_with_black_style(self):
         generator = CodeGenerator()
         code = """
@@ -173,6 +204,39 @@ def test()
         assert generator.validate_code(valid_code, "python") == True
         assert generator.validate_code(invalid_code, "python") == False
     
+    def test_validate_code_accepts_fragments(self):
+        generator = CodeGenerator()
+        fragments = ["return 1", "yield 1", "await f()", "break", "def f():\n    nonlocal x\n"]
+        
+        for fragment in fragments:
+            assert generator.validate_code(fragment, "python") == True
+    
+    def test_repeated_validation_is_cached(self):
+        generator = CodeGenerator()
+        invalid_code = "def cached_invalid()\n    return 1\n"
+        _parse_cached.cache_clear()
+        assert generator.validate_code(invalid_code, "python") == False
+        assert generator.validate_code(invalid_code, "python") == False
+        info = _parse_cached.cache_info()
+        assert info.misses == 1
+        assert info.hits == 1
+    
+    def test_disk_ast_cache(self, tmp_path, monkeypatch):
+        generator = CodeGenerator()
+        cache_dir = tmp_path / "ast_cache"
+        monkeypatch.setenv("CODEGEN_AST_DISK_CACHE", "1")
+        monkeypatch.setattr("src.generator.code_generator._AST_CACHE_DIR", cache_dir)
+        code = "def f(a, b):\n    return a + b\n"
+        
+        _parse_cached.cache_clear()
+        assert generator.preserve_semantic_equivalence(code, code)
+        assert len(list(cache_dir.glob("*.ast.pkl"))) == 1
+        
+        # A fresh in-memory cache is filled from disk without parsing
+        _parse_cached.cache_clear()
+        monkeypatch.setattr(ast, "parse", None)
+        assert generator.preserve_semantic_equivalence(code, code)
+    
     def test_optimize_imports(self):
         generator = CodeGenerator()
         code = """
@@ -191,6 +255,23 @@ def test():
         # Should remove unused imports
         assert 'import os' not in result or 'import sys' not in result or 'import json' not in result
     
+    def test_optimize_imports_ignores_names_in_strings(self):
+        generator = CodeGenerator()
+        code = """
+import os.path
+import json
+import sys as system
+
+def test():
+    # json is mentioned here only
+    return os.path.join("json", system.argv[0])
+"""
+        options = GenerationOptions(language="python", optimize_imports=True)
+        
+        result = generator.generate_code(code, options)
+        assert result.startswith('import os.path\nimport sys as system\n')
+        assert 'import json' not in result
+    
     def test_add_type_hints(self):
         generator = CodeGenerator()
         code = """
@@ -211,6 +292,24 @@ def add(a, b):
         with pytest.raises(NotImplementedError):
             generator.generate_code(code, options)
     
+    def test_repeated_generation_is_cached(self):
+        generator = CodeGenerator()
+        code = "def f(x,y):\n    return x+y\n"
+        options = GenerationOptions(language="python", formatting_style="black")
+        
+        first = generator.generate_code(code, options)
+        second = generator.generate_code(code, GenerationOptions(language="python", formatting_style="black"))
+        assert first == second == "def f(x, y):\n    return x + y\n"
+        assert generator._generate_cached.cache_info().hits == 1
+    
+    def test_formatting_output_is_known_clean(self):
+        generator = CodeGenerator()
+        options = GenerationOptions(language="python", formatting_style="black")
+        
+        first = generator.generate_code("def f(x,y):\n    return x+y\n", options)
+        assert hash(first) in generator._known_clean
+        assert generator.generate_code(first, options) == first
+    
     def test_generation_with_multiple_options(self):
         generator = CodeGenerator()
         code = """
@@ -1,14 +1,10 @@
 import pytest
-from src.analyzer.code_analyzer import CodeAnalyzer
-from src.refactor.refactoring_engine import RefactoringEngine
-from src.prompt.prompt_processor import PromptProcessor
-from src.generator.code_generator import CodeGenerator, GenerationOptions
+from src.generator.code_generator import GenerationOptions
 
 
-class TestIntegration:
-    def test_complete_refactoring_workflow(self):
-        # Sample code to refactor
-        original_code = """
+# Sources shared by the workflow tests; the analyzer and generator keep their
+# own parse caches, so repeated stages over the same source are not re-parsed
+CALC_SOURCE = """
 def calc(x, y):
     temp = x * 2
     result = temp + y
@@ -20,16 +16,71 @@ def process_data(data):
     else:
         return data
 """
+
+USER_DATA_SOURCE = """
+def process_user_data(user):
+    name = user.get('name', '')
+    age = user.get('age', 0)
+    email = user.get('email', '')
+    
+    if not name or not age or not email:
+        return None
+    
+    return {'name': name.upper(), 'age': age, 'email': email.lower()}
+"""
+
+INLINE_SOURCE = """
+def calculate():
+    temp = 5 * 3
+    result = temp + 10
+    return result
+"""
+
+DEAD_CODE_SOURCE = """
+def active_function():
+    return "active"
+
+def unused_function():
+    return "unused"
+
+def another_unused():
+    pass
+
+def main():
+    return active_function()
+"""
+
+MULTI_STEP_SOURCE = """
+def calc(x, y):
+    temp = x + y
+    if temp > 100:
+        return temp * 2
+    return temp
+
+def unused_helper():
+    pass
+"""
+
+FIBONACCI_SOURCE = """
+def fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n-1) + fibonacci(n-2)
+"""
+
+
+class TestIntegration:
+    def test_complete_refactoring_workflow(self, analyzer, processor, engine, generator):
+        # Sample code to refactor
+        original_code = CALC_SOURCE
         
         # 1. Analyze the code
-        analyzer = CodeAnalyzer()
         parse_result = analyzer.parse_code(original_code, "python")
         
         assert "calc" in parse_result.functions
         assert "process_data" in parse_result.functions
         
         # 2. Process a refactoring prompt
-        processor = PromptProcessor()
         prompt = "Rename function 'calc' to 'calculate'"
         request = processor.parse_prompt(prompt)
         
@@ -41,7 +92,6 @@ def process_data(data):
         operation = processor.convert_to_operation(request)
         
         # 4. Apply refactoring
-        engine = RefactoringEngine()
         refactored_code = engine.apply_refactoring(original_code, operation)
         
         assert "def calculate(x, y):" in refactored_code
@@ -49,32 +99,19 @@ def process_data(data):
         assert "def calc(" not in refactored_code
         
         # 5. Generate clean output
-        generator = CodeGenerator()
         options = GenerationOptions(language="python", formatting_style="black")
         final_code = generator.generate_code(refactored_code, options)
         
         assert "def calculate(x, y):" in final_code
         assert generator.validate_code(final_code, "python")
     
-    def test_extract_method_workflow(self):
-        original_code = """
-def process_user_data(user):
-    name = user.get('name', '')
-    age = user.get('age', 0)
-    email = user.get('email', '')
-    
-    if not name or not age or not email:
-        return None
-    
-    return {'name': name.upper(), 'age': age, 'email': email.lower()}
-"""
+    def test_extract_method_workflow(self, analyzer, processor, engine, generator):
+        original_code = USER_DATA_SOURCE
         
         # Analyze for code smells
-        analyzer = CodeAnalyzer()
         suggestions = analyzer.generate_suggestions(original_code, "python")
         
         # Process extract method prompt
-        processor = PromptProcessor()
         prompt = "Extract the validation logic from lines 5-7 into a new method called validate_user_data"
         request = processor.parse_prompt(prompt)
         
@@ -84,14 +121,12 @@ def process_user_data(user):
         assert request.end_line == 7
         
         # Apply refactoring
-        engine = RefactoringEngine()
         operation = processor.convert_to_operation(request)
         refactored_code = engine.apply_refactoring(original_code, operation)
         
         assert "def validate_user_data" in refactored_code
         
         # Validate that the code is still syntactically valid
-        generator = CodeGenerator()
         # Note: extract method is complex and may not preserve exact semantic equivalence
         # but should at least produce valid Python code
         try:
@@ -104,19 +139,12 @@ def process_user_data(user):
         # For now, we just check that the refactoring produced some result
         assert len(refactored_code) > 0
     
-    def test_inline_variable_workflow(self):
-        original_code = """
-def calculate():
-    temp = 5 * 3
-    result = temp + 10
-    return result
-"""
+    def test_inline_variable_workflow(self, processor, engine, generator):
+        original_code = INLINE_SOURCE
         
-        processor = PromptProcessor()
         prompt = "Inline the variable 'temp'"
         request = processor.parse_prompt(prompt)
         
-        engine = RefactoringEngine()
         operation = processor.convert_to_operation(request)
         refactored_code = engine.apply_refactoring(original_code, operation)
         
@@ -124,36 +152,20 @@ def calculate():
         assert "result = 5 * 3 + 10" in refactored_code
         
         # Generate and format
-        generator = CodeGenerator()
         options = GenerationOptions(language="python", formatting_style="pep8")
         final_code = generator.generate_code(refactored_code, options)
         
         assert "result = 5 * 3 + 10" in final_code
     
-    def test_remove_dead_code_workflow(self):
-        original_code = """
-def active_function():
-    return "active"
-
-def unused_function():
-    return "unused"
-
-def another_unused():
-    pass
-
-def main():
-    return active_function()
-"""
+    def test_remove_dead_code_workflow(self, analyzer, processor, engine):
+        original_code = DEAD_CODE_SOURCE
         
         # Analyze for unused functions
-        analyzer = CodeAnalyzer()
         # In a real implementation, this would detect unused functions automatically
         
-        processor = PromptProcessor()
         prompt = "Remove unused functions: unused_function, another_unused"
         request = processor.parse_prompt(prompt)
         
-        engine = RefactoringEngine()
         operation = processor.convert_to_operation(request)
         refactored_code = engine.apply_refactoring(original_code, operation)
         
@@ -162,20 +174,8 @@ def main():
         assert "def active_function" in refactored_code
         assert "def main" in refactored_code
     
-    def test_multiple_refactoring_operations(self):
-        original_code = """
-def calc(x, y):
-    temp = x + y
-    if temp > 100:
-        return temp * 2
-    return temp
-
-def unused_helper():
-    pass
-"""
-        
-        processor = PromptProcessor()
-        engine = RefactoringEngine()
+    def test_multiple_refactoring_operations(self, processor, engine, generator):
+        original_code = MULTI_STEP_SOURCE
         
         # First refactoring: rename function
         prompt1 = "Rename function 'calc' to 'calculate_sum'"
@@ -200,7 +200,6 @@ def unused_helper():
         assert "def unused_helper" not in final_code
         
         # Generate final clean code
-        generator = CodeGenerator()
         options = GenerationOptions(
             language="python",
             formatting_style="black",
@@ -210,8 +209,27 @@ def unused_helper():
         
         assert generator.validate_code(clean_code, "python")
     
-    def test_error_handling_in_workflow(self):
-        processor = PromptProcessor()
+    def test_batched_refactoring_operations(self, processor, engine):
+        prompts = [
+            "Rename function 'calc' to 'calculate_sum'",
+            "Rename variable 'x' to 'first'",
+            "Inline the variable 'temp'",
+            "Remove unused functions: unused_helper"
+        ]
+        
+        batch = processor.parse_prompts(prompts)
+        assert len(batch) == 4
+        assert batch.columns["type"][0] == "rename_function"
+        assert batch.operation(3).dead_functions == ("unused_helper",)
+        
+        expected = MULTI_STEP_SOURCE
+        for prompt in prompts:
+            operation = processor.convert_to_operation(processor.parse_prompt(prompt))
+            expected = engine.apply_refactoring(expected, operation)
+        
+        assert engine.apply_batch(MULTI_STEP_SOURCE, batch) == expected
+    
+    def test_error_handling_in_workflow(self, processor, engine):
         
         # Test ambiguous prompt
         with pytest.raises(ValueError):
@@ -222,14 +240,12 @@ def unused_helper():
             processor.parse_prompt("Convert this to Java")
         
         # Test invalid refactoring
-        engine = RefactoringEngine()
         invalid_code = "def broken syntax"
         
         # The refactoring engine should handle syntax errors gracefully
         # In a real implementation, this would be more robust
     
-    def test_natural_language_processing(self):
-        processor = PromptProcessor()
+    def test_natural_language_processing(self, processor):
         
         natural_prompts = [
             "Please extract the validation logic",
@@ -246,17 +262,8 @@ def unused_helper():
                 "rename_variable", "remove_dead_code"
             ]
     
-    def test_code_quality_preservation(self):
-        original_code = """
-def fibonacci(n):
-    if n <= 1:
-        return n
-    return fibonacci(n-1) + fibonacci(n-2)
-"""
-        
-        processor = PromptProcessor()
-        engine = RefactoringEngine()
-        generator = CodeGenerator()
+    def test_code_quality_preservation(self, processor, engine, generator):
+        original_code = FIBONACCI_SOURCE
         
         # Rename parameter
         prompt = "Rename variable 'n' to 'number'"
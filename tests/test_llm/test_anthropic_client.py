@@ -1,10 +1,35 @@
 """Tests for Anthropic API client"""
+import asyncio
 import os
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock
 
 # This import will fail initially (Red phase)
 from src.llm.anthropic_client import AnthropicClient, APIResponse
+from src.llm.response_store import ResponseStore
+from src.llm.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def mocked_anthropic(monkeypatch):
+    """Anthropic SDK client mock used by AnthropicClient instances created in a test"""
+    mock_anthropic_class = MagicMock()
+    monkeypatch.setattr('src.llm.anthropic_client.AsyncAnthropic', mock_anthropic_class)
+    mock_client = mock_anthropic_class.return_value
+    mock_client.messages.create = AsyncMock()
+    return mock_client
+
+
+def _mock_response(text, input_tokens, output_tokens, model="claude-3-sonnet-20240229"):
+    """Build a mock messages.create() response"""
+    mock_response = MagicMock()
+    mock_response.content = [MagicMock(text=text)]
+    mock_response.model = model
+    mock_response.usage.input_tokens = input_tokens
+    mock_response.usage.output_tokens = output_tokens
+    mock_response.usage.cache_creation_input_tokens = 0
+    mock_response.usage.cache_read_input_tokens = 0
+    return mock_response
 
 
 class TestAnthropicClient:
@@ -27,50 +52,26 @@ class TestAnthropicClient:
             with pytest.raises(ValueError, match="API key not found"):
                 AnthropicClient()
 
-    @patch('src.llm.anthropic_client.Anthropic')
-    def test_anthropic_client_connection_mock(self, mock_anthropic_class):
+    def test_anthropic_client_connection_mock(self, mocked_anthropic):
         """APIへの接続をモックでテスト"""
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock response
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text="OK")]
-        mock_response.model = "claude-3-sonnet-20240229"
-        mock_response.usage.input_tokens = 5
-        mock_response.usage.output_tokens = 1
-        
-        mock_client.messages.create.return_value = mock_response
+        mocked_anthropic.messages.create.return_value = _mock_response("OK", 5, 1)
         
         # Test
         client = AnthropicClient(api_key="test-key")
-        response = client.test_connection()
+        response = asyncio.run(client.test_connection())
         
         assert response.status == "connected"
         assert response.content == "OK"
         assert response.usage["input_tokens"] == 5
         assert response.usage["output_tokens"] == 1
 
-    @patch('src.llm.anthropic_client.Anthropic')
-    def test_anthropic_prompt_execution_mock(self, mock_anthropic_class):
+    def test_anthropic_prompt_execution_mock(self, mocked_anthropic):
         """プロンプト実行のモックテスト"""
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock response
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text="Hello! I'm Claude.")]
-        mock_response.model = "claude-3-sonnet-20240229"
-        mock_response.usage.input_tokens = 10
-        mock_response.usage.output_tokens = 20
-        
-        mock_client.messages.create.return_value = mock_response
+        mocked_anthropic.messages.create.return_value = _mock_response("Hello! I'm Claude.", 10, 20)
         
         # Test
         client = AnthropicClient(api_key="test-key")
-        response = client.execute_prompt("Hello, Claude")
+        response = asyncio.run(client.execute_prompt("Hello, Claude"))
         
         assert response.content == "Hello! I'm Claude."
         assert response.model == "claude-3-sonnet-20240229"
@@ -78,53 +79,273 @@ class TestAnthropicClient:
         assert response.usage["output_tokens"] == 20
         
         # Verify API was called correctly
-        mock_client.messages.create.assert_called_once()
-        call_args = mock_client.messages.create.call_args[1]
+        mocked_anthropic.messages.create.assert_called_once()
+        call_args = mocked_anthropic.messages.create.call_args[1]
         assert call_args["messages"] == [{"role": "user", "content": "Hello, Claude"}]
         assert call_args["model"] == "claude-3-sonnet-20240229"
 
-    @patch('src.llm.anthropic_client.Anthropic')
-    def test_anthropic_system_prompt(self, mock_anthropic_class):
+    def test_anthropic_system_prompt(self, mocked_anthropic):
         """システムプロンプトを含むプロンプト実行のテスト"""
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-        
-        # Mock response
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text="I understand.")]
-        mock_response.model = "claude-3-sonnet-20240229"
-        mock_response.usage.input_tokens = 15
-        mock_response.usage.output_tokens = 5
-        
-        mock_client.messages.create.return_value = mock_response
+        mocked_anthropic.messages.create.return_value = _mock_response("I understand.", 15, 5)
         
         # Test
         client = AnthropicClient(api_key="test-key")
-        response = client.execute_prompt(
+        response = asyncio.run(client.execute_prompt(
             "What's your role?",
             system_prompt="You are a helpful assistant."
-        )
+        ))
         
         assert response.content == "I understand."
         
         # Verify system prompt was passed
-        call_args = mock_client.messages.create.call_args[1]
-        assert call_args["system"] == "You are a helpful assistant."
+        call_args = mocked_anthropic.messages.create.call_args[1]
+        assert call_args["system"] == [{
+            "type": "text",
+            "text": "You are a helpful assistant.",
+            "cache_control": {"type": "ephemeral"}
+        }]
 
-    @patch('src.llm.anthropic_client.Anthropic')
-    def test_anthropic_api_error_handling(self, mock_anthropic_class):
-        """APIエラーのハンドリングテスト"""
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
+    def test_anthropic_prompt_prefix_caching(self, mocked_anthropic):
+        """静的なプロンプト接頭辞にcache_controlを付け、キャッシュ使用量を返す"""
+        mock_response = _mock_response("Done.", 12, 3)
+        mock_response.usage.cache_read_input_tokens = 2048
+        mocked_anthropic.messages.create.return_value = mock_response
+        
+        client = AnthropicClient(api_key="test-key")
+        response = asyncio.run(client.execute_prompt("Refactor foo", prompt_prefix="<code>...</code>"))
+        
+        call_args = mocked_anthropic.messages.create.call_args[1]
+        assert call_args["messages"] == [{"role": "user", "content": [
+            {"type": "text", "text": "<code>...</code>", "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": "Refactor foo"}
+        ]}]
+        assert response.usage["cache_read_input_tokens"] == 2048
+        assert response.usage["cache_creation_input_tokens"] == 0
+
+    def test_anthropic_response_cache(self, mocked_anthropic):
+        """同一リクエストはキャッシュから返し、clear_cacheで破棄できる"""
+        mocked_anthropic.messages.create.return_value = _mock_response("Cached.", 10, 5)
+        client = AnthropicClient(api_key="test-key")
+        
+        first = asyncio.run(client.execute_prompt("Hello", system_prompt="Be brief."))
+        first.usage["input_tokens"] = -1
+        second = asyncio.run(client.execute_prompt("Hello", system_prompt="Be brief."))
+        assert second.content == "Cached."
+        assert second.usage["input_tokens"] == 10
+        assert mocked_anthropic.messages.create.call_count == 1
+        
+        asyncio.run(client.execute_prompt("Hello", system_prompt="Be verbose."))
+        assert mocked_anthropic.messages.create.call_count == 2
+        
+        client.clear_cache()
+        asyncio.run(client.execute_prompt("Hello", system_prompt="Be brief."))
+        assert mocked_anthropic.messages.create.call_count == 3
+
+    def test_anthropic_semantic_cache(self, mocked_anthropic):
+        """類似プロンプトは意味キャッシュから返す"""
+        mocked_anthropic.messages.create.return_value = _mock_response("Renamed.", 10, 5)
+        vocabulary = ["rename", "foo", "bar"]
+        semantic_cache = SemanticCache(
+            encoder=lambda text: [float(text.split().count(word)) for word in vocabulary],
+            threshold=0.9
+        )
+        client = AnthropicClient(api_key="test-key", semantic_cache=semantic_cache)
+        
+        asyncio.run(client.execute_prompt("rename foo to bar"))
+        response = asyncio.run(client.execute_prompt("please rename foo into bar"))
+        assert response.content == "Renamed."
+        assert mocked_anthropic.messages.create.call_count == 1
+    
+    def test_anthropic_semantic_cache_requires_matching_identifiers(self, mocked_anthropic):
+        """引用された識別子が違うプロンプトは意味キャッシュから返さない"""
+        mocked_anthropic.messages.create.side_effect = [
+            _mock_response("Renamed to bar.", 10, 5),
+            _mock_response("Renamed to baz.", 10, 5)
+        ]
+        # Every prompt embeds alike, as near-identical prompts do
+        client = AnthropicClient(api_key="test-key", semantic_cache=SemanticCache(encoder=lambda text: [1.0, 0.0]))
+        
+        asyncio.run(client.execute_prompt("rename 'foo' to 'bar'"))
+        assert asyncio.run(client.execute_prompt("rename 'foo' to 'baz'")).content == "Renamed to baz."
+        assert asyncio.run(client.execute_prompt("please rename 'foo' into 'bar'")).content == "Renamed to bar."
+        assert mocked_anthropic.messages.create.call_count == 2
+
+    def test_anthropic_concurrent_identical_prompts_share_one_call(self, mocked_anthropic):
+        """同時に実行中の同一プロンプトは1回のAPI呼び出しを共有する"""
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.01)
+            return _mock_response("shared", 10, 2)
+        mocked_anthropic.messages.create.side_effect = slow_create
+        
+        client = AnthropicClient(api_key="test-key")
+        
+        async def run():
+            return await asyncio.gather(*(client.execute_prompt("Refactor this") for _ in range(3)))
+        
+        responses = asyncio.run(run())
+        
+        assert [r.content for r in responses] == ["shared"] * 3
+        assert mocked_anthropic.messages.create.await_count == 1
+        assert not client._inflight
+    
+    def test_anthropic_concurrent_identical_prompts_with_semantic_cache(self, mocked_anthropic):
+        """意味キャッシュの埋め込み計算中に届いた同一プロンプトも1回の呼び出しを共有する"""
+        async def slow_create(**kwargs):
+            await asyncio.sleep(0.01)
+            return _mock_response("shared", 10, 2)
+        mocked_anthropic.messages.create.side_effect = slow_create
+        
+        client = AnthropicClient(api_key="test-key", semantic_cache=SemanticCache(encoder=lambda text: [1.0, 0.0]))
+        
+        async def run():
+            return await asyncio.gather(client.execute_prompt("same"), client.execute_prompt("same"))
         
+        responses = asyncio.run(run())
+        
+        assert [r.content for r in responses] == ["shared"] * 2
+        assert mocked_anthropic.messages.create.await_count == 1
+        assert not client._inflight
+    
+    def test_get_client_returns_shared_instance(self, mocked_anthropic):
+        """get_clientはプロセス共通のクライアントを返す"""
+        from src.llm import anthropic_client
+        mocked_anthropic.close = AsyncMock()
+        
+        with patch.dict(os.environ, {"ANTHROPIC_API_KEY": "env-test-key"}):
+            client = anthropic_client.get_client()
+            assert anthropic_client.get_client() is client
+            asyncio.run(anthropic_client.close_client())
+            assert anthropic_client.get_client() is not client
+            asyncio.run(anthropic_client.close_client())
+    
+    def test_anthropic_prompt_stream(self, mocked_anthropic):
+        """レスポンスを逐次受け取り、完了後はキャッシュする"""
+        final_message = _mock_response("Hello, world", 10, 3)
+        final_message.content = [MagicMock(type="text", text="Hello, world")]
+        
+        class FakeStream:
+            async def __aenter__(self):
+                return self
+            
+            async def __aexit__(self, *exc_info):
+                return False
+            
+            @property
+            async def text_stream(self):
+                for chunk in ("Hello", ", ", "world"):
+                    yield chunk
+            
+            async def get_final_message(self):
+                return final_message
+        
+        mocked_anthropic.messages.stream = MagicMock(return_value=FakeStream())
+        client = AnthropicClient(api_key="test-key")
+        
+        async def collect():
+            return [chunk async for chunk in client.execute_prompt_stream("Say hello", system_prompt="Be brief")]
+        
+        assert asyncio.run(collect()) == ["Hello", ", ", "world"]
+        call_kwargs = mocked_anthropic.messages.stream.call_args.kwargs
+        assert call_kwargs["system"][0]["text"] == "Be brief"
+        
+        # 完了したストリームはexecute_promptのキャッシュにも入る
+        response = asyncio.run(client.execute_prompt("Say hello", system_prompt="Be brief"))
+        assert response.content == "Hello, world"
+        assert asyncio.run(collect()) == ["Hello, world"]
+        assert mocked_anthropic.messages.stream.call_count == 1
+        mocked_anthropic.messages.create.assert_not_called()
+    
+    def test_anthropic_prompts_batch(self, mocked_anthropic):
+        """複数プロンプトを同時実行数の上限内で並列実行し、順序を保つ"""
+        running = 0
+        peak = 0
+        
+        async def create(**kwargs):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            text = kwargs["messages"][0]["content"]
+            if text == "fail":
+                raise RuntimeError("boom")
+            return _mock_response(text.upper(), 1, 1)
+        mocked_anthropic.messages.create.side_effect = create
+        
+        client = AnthropicClient(api_key="test-key")
+        prompts = [("a", None), ("b", "sys"), ("fail", None), ("c", None), ("d", None)]
+        responses = asyncio.run(client.execute_prompts_batch(prompts, concurrency=2))
+        
+        assert [r.content for r in responses[:2]] == ["A", "B"]
+        assert responses[2].status == "error"
+        assert [r.content for r in responses[3:]] == ["C", "D"]
+        assert peak == 2
+    
+    def test_anthropic_response_store_survives_restart(self, mocked_anthropic, tmp_path):
+        """ディスクに保存したレスポンスは新しいクライアントでも再利用する"""
+        mocked_anthropic.messages.create.return_value = _mock_response("persisted", 10, 2)
+        path = str(tmp_path / "responses.sqlite3")
+        
+        client = AnthropicClient(api_key="test-key", response_store=ResponseStore(path))
+        asyncio.run(client.execute_prompt("Refactor this"))
+        client._response_store.close()
+        
+        restarted = AnthropicClient(api_key="test-key", response_store=ResponseStore(path))
+        response = asyncio.run(restarted.execute_prompt("Refactor this"))
+        
+        assert response.content == "persisted"
+        assert response.usage["input_tokens"] == 10
+        assert mocked_anthropic.messages.create.await_count == 1
+    
+    def test_anthropic_response_size_is_bounded(self, mocked_anthropic):
+        """上限を超えるレスポンスは切り詰めてstatusをtruncatedにする"""
+        mocked_anthropic.messages.create.return_value = _mock_response("あいうえお" * 4, 10, 20)
+        
+        client = AnthropicClient(api_key="test-key")
+        client.max_response_bytes = 10
+        response = asyncio.run(client.execute_prompt("Long answer please"))
+        
+        # 文字の途中では切らない（1文字3バイト）
+        assert response.content == "あいう"
+        assert response.status == "truncated"
+        
+        client.max_response_bytes = 1024
+        response = asyncio.run(client.execute_prompt("Short answer please"))
+        assert response.status is None
+    
+    def test_anthropic_errors_are_not_cached(self, mocked_anthropic):
+        """エラー応答はキャッシュしない"""
+        mocked_anthropic.messages.create.side_effect = [
+            Exception("Overloaded"),
+            _mock_response("Recovered.", 3, 1)
+        ]
+        client = AnthropicClient(api_key="test-key")
+        
+        assert asyncio.run(client.execute_prompt("Hello")).status == "error"
+        assert asyncio.run(client.execute_prompt("Hello")).content == "Recovered."
+    
+    def test_anthropic_truncated_responses_are_not_cached(self, mocked_anthropic):
+        """切り詰めたレスポンスは次の呼び出しで再利用しない"""
+        mocked_anthropic.messages.create.return_value = _mock_response("abcdefghij", 10, 20)
+        client = AnthropicClient(api_key="test-key")
+        client.max_response_bytes = 4
+        
+        assert asyncio.run(client.execute_prompt("Long answer please")).status == "truncated"
+        client.max_response_bytes = 1024
+        response = asyncio.run(client.execute_prompt("Long answer please"))
+        
+        assert response.content == "abcdefghij"
+        assert response.status is None
+        assert mocked_anthropic.messages.create.await_count == 2
+
+    def test_anthropic_api_error_handling(self, mocked_anthropic):
+        """APIエラーのハンドリングテスト"""
         # Mock API error - use generic Exception instead of APIError
-        mock_client.messages.create.side_effect = Exception("Rate limit exceeded")
+        mocked_anthropic.messages.create.side_effect = Exception("Rate limit exceeded")
         
         # Test
         client = AnthropicClient(api_key="test-key")
-        response = client.execute_prompt("Hello")
+        response = asyncio.run(client.execute_prompt("Hello"))
         
         assert "API Error" in response.content
         assert "Rate limit exceeded" in response.content
@@ -140,7 +361,7 @@ class TestAnthropicClient:
             pytest.skip("ANTHROPIC_API_KEY not set")
             
         client = AnthropicClient()
-        response = client.test_connection()
+        response = asyncio.run(client.test_connection())
         assert response.status == "connected"
         assert len(response.content) > 0
 
@@ -152,7 +373,7 @@ class TestAnthropicClient:
             pytest.skip("ANTHROPIC_API_KEY not set")
             
         client = AnthropicClient()
-        response = client.execute_prompt("Say 'Hello, test!' and nothing else.")
+        response = asyncio.run(client.execute_prompt("Say 'Hello, test!' and nothing else."))
         assert len(response.content) > 0
         assert response.model is not None
         assert response.usage is not None
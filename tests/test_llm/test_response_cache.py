@@ -0,0 +1,36 @@
+"""Tests for the in-memory LLM response cache"""
+from src.llm.response_cache import ResponseCache, cache_key
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache"""
+
+    def test_cache_key_separates_parts(self):
+        """区切り位置が異なる入力は別のキーになる"""
+        assert cache_key("ab", "c") != cache_key("a", "bc")
+        assert cache_key("model", None, "prompt") == cache_key("model", "", "prompt")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """上限を超えると最も使われていないエントリを破棄する"""
+        cache = ResponseCache(maxsize=2)
+        cache.set(b"a", 1)
+        cache.set(b"b", 2)
+        assert cache.get(b"a") == 1
+        cache.set(b"c", 3)
+        
+        assert cache.get(b"b") is None
+        assert cache.get(b"a") == 1
+        assert cache.get(b"c") == 3
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        """TTLを過ぎたエントリは返さない"""
+        now = [1000.0]
+        monkeypatch.setattr("src.llm.response_cache.time.monotonic", lambda: now[0])
+        cache = ResponseCache(ttl=60)
+        cache.set(b"a", 1)
+        
+        now[0] += 59
+        assert cache.get(b"a") == 1
+        now[0] += 2
+        assert cache.get(b"a") is None
+        assert len(cache) == 0
\ No newline at end of file
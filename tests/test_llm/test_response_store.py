@@ -0,0 +1,32 @@
+"""Tests for the disk-backed LLM response store"""
+from src.llm.response_store import ResponseStore
+
+
+class TestResponseStore:
+    """Test suite for ResponseStore"""
+
+    def test_entries_survive_reopening(self, tmp_path):
+        """保存した値は開き直しても読み出せる"""
+        path = str(tmp_path / "responses.sqlite3")
+        store = ResponseStore(path)
+        store.set(b"a", {"content": "one"})
+        store.set(b"a", {"content": "two"})
+        store.close()
+        
+        reopened = ResponseStore(path)
+        assert reopened.get(b"a") == {"content": "two"}
+        assert reopened.get(b"missing") is None
+        assert len(reopened) == 1
+
+    def test_entries_expire_after_ttl(self, tmp_path, monkeypatch):
+        """TTLを過ぎたエントリは返さず、開き直すと削除する"""
+        now = [1000.0]
+        monkeypatch.setattr("src.llm.response_store.time.time", lambda: now[0])
+        path = str(tmp_path / "responses.sqlite3")
+        store = ResponseStore(path, ttl=60)
+        store.set(b"a", 1)
+        now[0] += 61
+        
+        assert store.get(b"a") is None
+        store.close()
+        assert len(ResponseStore(path, ttl=60)) == 0
\ No newline at end of file
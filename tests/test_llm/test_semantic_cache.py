@@ -0,0 +1,46 @@
+"""Tests for the similarity-based LLM response cache"""
+from src.llm.semantic_cache import SemanticCache, quoted_identifiers
+
+
+VOCABULARY = ["rename", "foo", "bar", "function", "extract", "method"]
+
+
+def bag_of_words(text):
+    """Tiny deterministic encoder used instead of a sentence-transformers model"""
+    words = text.lower().split()
+    return [float(words.count(word)) for word in VOCABULARY]
+
+
+class TestSemanticCache:
+    """Test suite for SemanticCache"""
+
+    def test_similar_prompt_hits(self):
+        """言い回しが違うだけのプロンプトはキャッシュにヒットする"""
+        cache = SemanticCache(encoder=bag_of_words, threshold=0.8)
+        cache.add(cache.encode("rename foo to bar"), b"scope", "renamed")
+        
+        assert cache.search(cache.encode("please rename function foo into bar"), b"scope") == "renamed"
+        assert cache.search(cache.encode("extract method"), b"scope") is None
+
+    def test_other_scope_does_not_hit(self):
+        """モデルやシステムプロンプトが違う場合はヒットしない"""
+        cache = SemanticCache(encoder=bag_of_words)
+        cache.add(cache.encode("rename foo to bar"), b"scope-a", "renamed")
+        
+        assert cache.search(cache.encode("rename foo to bar"), b"scope-b") is None
+
+    def test_quoted_identifiers(self):
+        """引用された識別子を順番どおりに取り出す"""
+        assert quoted_identifiers("rename 'foo' to \"bar\" in `self.run`") == ("foo", "bar", "self.run")
+        assert quoted_identifiers("rename foo to bar") == ()
+
+    def test_index_round_trip(self, tmp_path):
+        """保存したインデックスを読み込み直せる"""
+        path = str(tmp_path / "semantic.index")
+        cache = SemanticCache(encoder=bag_of_words, index_path=path)
+        cache.add(cache.encode("rename foo to bar"), b"scope", {"content": "renamed"})
+        cache.save()
+        
+        reloaded = SemanticCache(encoder=bag_of_words, index_path=path)
+        assert len(reloaded) == 1
+        assert reloaded.search(reloaded.encode("rename foo to bar"), b"scope") == {"content": "renamed"}
\ No newline at end of file
@@ -1,11 +1,11 @@
 import pytest
+from dataclasses import FrozenInstanceError
 from src.prompt.prompt_processor import PromptProcessor, RefactoringRequest
 from src.refactor.refactoring_engine import RefactoringOperation
 
 
 class TestPromptProcessor:
-    def test_parse_extract_method_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_extract_method_prompt(self, processor):
         prompt = "Extract the calculation logic from lines 5-10 into a new method called calculate_discount"
         
         result = processor.parse_prompt(prompt)
@@ -15,8 +15,7 @@ class TestPromptProcessor:
         assert result.start_line == 5
         assert result.end_line == 10
     
-    def test_parse_rename_function_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_rename_function_prompt(self, processor):
         prompt = "Rename function 'calc' to 'calculate_sum'"
         
         result = processor.parse_prompt(prompt)
@@ -25,8 +24,35 @@ class TestPromptProcessor:
         assert result.old_name == "calc"
         assert result.new_name == "calculate_sum"
     
-    def test_parse_rename_variable_prompt(self):
+    def test_parse_prompt_preserves_identifier_case(self, processor):
+        prompt = "RENAME FUNCTION 'getUser' TO 'fetchUser'"
+        
+        result = processor.parse_prompt(prompt)
+        
+        assert result.operation_type == "rename_function"
+        assert result.old_name == "getUser"
+        assert result.new_name == "fetchUser"
+    
+    def test_parse_prompt_uses_prefilter_hits_in_priority_order(self):
+        # Own instance: the prefilter is replaced below
         processor = PromptProcessor()
+        ids = {}
+        for i, (op, _) in enumerate(processor._pattern_table):
+            ids.setdefault(op, i)
+        
+        class FakeDatabase:
+            def scan(self, data, match_event_handler):
+                # Reported out of order; the lowest id must still win
+                match_event_handler(ids['rename_variable'], 0, len(data), 0, None)
+                match_event_handler(ids['rename_function'], 0, len(data), 0, None)
+        
+        processor._hyperscan_db = FakeDatabase()
+        result = processor.parse_prompt("Rename function 'calc' to 'calculate_sum'")
+        
+        assert result.operation_type == "rename_function"
+        assert result.new_name == "calculate_sum"
+    
+    def test_parse_rename_variable_prompt(self, processor):
         prompt = "Rename variable 'x' to 'input_value'"
         
         result = processor.parse_prompt(prompt)
@@ -35,8 +61,7 @@ class TestPromptProcessor:
         assert result.old_name == "x"
         assert result.new_name == "input_value"
     
-    def test_parse_inline_variable_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_inline_variable_prompt(self, processor):
         prompt = "Inline the variable 'temp'"
         
         result = processor.parse_prompt(prompt)
@@ -44,8 +69,7 @@ class TestPromptProcessor:
         assert result.operation_type == "inline_variable"
         assert result.variable_name == "temp"
     
-    def test_parse_inline_function_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_inline_function_prompt(self, processor):
         prompt = "Inline the function 'simple_add'"
         
         result = processor.parse_prompt(prompt)
@@ -53,8 +77,7 @@ class TestPromptProcessor:
         assert result.operation_type == "inline_function"
         assert result.function_name == "simple_add"
     
-    def test_parse_move_method_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_move_method_prompt(self, processor):
         prompt = "Move method 'add' from Calculator class to MathUtils class"
         
         result = processor.parse_prompt(prompt)
@@ -64,8 +87,7 @@ class TestPromptProcessor:
         assert result.source_class == "Calculator"
         assert result.target_class == "MathUtils"
     
-    def test_parse_remove_dead_code_prompt(self):
-        processor = PromptProcessor()
+    def test_parse_remove_dead_code_prompt(self, processor):
         prompt = "Remove unused functions: unused_function, old_helper"
         
         result = processor.parse_prompt(prompt)
@@ -74,20 +96,49 @@ class TestPromptProcessor:
         assert "unused_function" in result.dead_functions
         assert "old_helper" in result.dead_functions
     
-    def test_validate_prompt_success(self):
+    def test_repeated_prompt_is_parsed_once(self):
+        # Own instance so the cache statistics start at zero
         processor = PromptProcessor()
+        prompt = "Remove unused functions: old_helper, legacy"
+        
+        first = processor.parse_prompt(prompt)
+        second = processor.parse_prompt(prompt)
+        
+        # Requests are frozen, so the cached one is shared
+        assert second is first
+        assert second.dead_functions == ("old_helper", "legacy")
+        with pytest.raises(FrozenInstanceError):
+            first.dead_functions = ()
+        assert processor._parse_cached.cache_info().hits == 1
+    
+    def test_converted_operations_are_cached(self, processor):
+        request = RefactoringRequest(operation_type="remove_dead_code", dead_functions=["old_helper"])
+        
+        operation = processor.convert_to_operation(request)
+        
+        assert operation == RefactoringOperation(type="remove_dead_code", dead_functions=("old_helper",))
+        assert processor.convert_to_operation(RefactoringRequest(
+            operation_type="remove_dead_code", dead_functions=["old_helper"])) is operation
+    
+    def test_every_pattern_requires_a_prefilter_word(self, processor):
+        # parse_prompt skips the regexes when none of these words occur
+        words = processor._keyword_matcher._categories['pattern_words']
+        
+        for patterns in processor.operation_patterns.values():
+            for pattern in patterns:
+                assert any(word in pattern for word in words), pattern
+    
+    def test_validate_prompt_success(self, processor):
         prompt = "Rename function 'calc' to 'calculate_sum'"
         
         assert processor.validate_prompt(prompt) == True
     
-    def test_validate_prompt_failure(self):
-        processor = PromptProcessor()
+    def test_validate_prompt_failure(self, processor):
         invalid_prompt = "Do something random with code"
         
         assert processor.validate_prompt(invalid_prompt) == False
     
-    def test_convert_to_operation(self):
-        processor = PromptProcessor()
+    def test_convert_to_operation(self, processor):
         request = RefactoringRequest(
             operation_type="rename_function",
             old_name="calc",
@@ -101,16 +152,20 @@ class TestPromptProcessor:
         assert operation.old_name == "calc"
         assert operation.new_name == "calculate_sum"
     
-    def test_extract_intent_from_prompt(self):
-        processor = PromptProcessor()
+    def test_extract_intent_from_prompt(self, processor):
         prompt = "This function is too long, please extract some methods"
         
         intent = processor.extract_intent(prompt)
         
         assert intent == "extract_method"
     
-    def test_suggest_refactoring_from_prompt(self):
+    def test_extract_intent_tolerates_typos(self):
+        pytest.importorskip("rapidfuzz")
         processor = PromptProcessor()
+        
+        assert processor.extract_intent("Please extarct this loop") == "extract_method"
+    
+    def test_suggest_refactoring_from_prompt(self, processor):
         prompt = "This code has duplicate logic that should be removed"
         
         suggestions = processor.suggest_refactoring(prompt)
@@ -118,9 +173,19 @@ class TestPromptProcessor:
         assert len(suggestions) > 0
         assert any("extract" in s.lower() or "duplicate" in s.lower() for s in suggestions)
     
-    def test_natural_language_understanding(self):
-        processor = PromptProcessor()
-        
+    def test_suggest_refactoring_for_several_smells(self, processor):
+        suggestions = processor.suggest_refactoring("This unused helper is long and confusing")
+        
+        assert suggestions == [
+            "Extract methods to reduce complexity",
+            "Break down into smaller functions",
+            "Rename variables and functions for clarity",
+            "Add descriptive method names",
+            "Remove unused code",
+        ]
+        assert processor.suggest_refactoring("Tidy this up") == ["Consider extracting methods or renaming for clarity"]
+    
+    def test_natural_language_understanding(self, processor):
         prompts = [
             "Please extract the validation logic",
             "Can you rename this function to something more descriptive?",
@@ -133,15 +198,19 @@ class TestPromptProcessor:
             assert result is not None
             assert result.operation_type in ["extract_method", "rename_function", "rename_variable", "remove_dead_code"]
     
-    def test_ambiguous_prompt_handling(self):
-        processor = PromptProcessor()
+    def test_ambiguous_prompt_handling(self, processor):
         ambiguous_prompt = "Make this code better"
         
         with pytest.raises(ValueError, match="Ambiguous prompt"):
             processor.parse_prompt(ambiguous_prompt)
     
-    def test_unsupported_operation_prompt(self):
-        processor = PromptProcessor()
+    def test_explicit_operation_overrides_vague_wording(self, processor):
+        result = processor.parse_prompt("Make it better: rename variable 'x' to 'total'")
+        
+        assert result.operation_type == "rename_variable"
+        assert result.new_name == "total"
+    
+    def test_unsupported_operation_prompt(self, processor):
         unsupported_prompt = "Convert this to a different programming language"
         
         with pytest.raises(NotImplementedError):
@@ -1,10 +1,10 @@
 import pytest
-from src.refactor.refactoring_engine import RefactoringEngine, RefactoringOperation
+from concurrent.futures import ThreadPoolExecutor
+from src.refactor.refactoring_engine import RefactoringEngine, RefactoringOperation, _parse_cached
 
 
 class TestRefactoringEngine:
-    def test_extract_method(self):
-        engine = RefactoringEngine()
+    def test_extract_method(self, engine):
         code = """
 def calculate_total(items):
     total = 0
@@ -32,8 +32,7 @@ def calculate_total(items):
         assert "def calculate_discounted_price" in result
         assert "discounted_price = calculate_discounted_price(item.price)" in result
     
-    def test_rename_variable(self):
-        engine = RefactoringEngine()
+    def test_rename_variable(self, engine):
         code = """
 def process_data(x):
     y = x * 2
@@ -51,8 +50,7 @@ def process_data(x):
         assert "y = input_value * 2" in result
         assert "x" not in result.replace("input_value", "")
     
-    def test_rename_function(self):
-        engine = RefactoringEngine()
+    def test_rename_function(self, engine):
         code = """
 def calc(a, b):
     return a + b
@@ -71,8 +69,7 @@ def main():
         assert "def calculate_sum(a, b):" in result
         assert "result = calculate_sum(5, 3)" in result
     
-    def test_inline_variable(self):
-        engine = RefactoringEngine()
+    def test_inline_variable(self, engine):
         code = """
 def calculate():
     temp = 5 * 3
@@ -88,8 +85,7 @@ def calculate():
         assert "result = 5 * 3 + 10" in result
         assert "temp = 5 * 3" not in result
     
-    def test_inline_function(self):
-        engine = RefactoringEngine()
+    def test_inline_function(self, engine):
         code = """
 def simple_add(a, b):
     return a + b
@@ -107,8 +103,24 @@ def calculate():
         assert "x = 5 + 3" in result
         assert "def simple_add" not in result
     
-    def test_move_method(self):
-        engine = RefactoringEngine()
+    def test_inline_function_at_several_call_sites(self, engine):
+        code = """
+def add(a, b):
+    return a + b
+
+x = add(1, 2)
+y = add(3, 4)
+"""
+        operation = RefactoringOperation(
+            type="inline_function",
+            function_name="add"
+        )
+        
+        result = engine.apply_refactoring(code, operation)
+        assert "x = 1 + 2" in result
+        assert "y = 3 + 4" in result
+    
+    def test_move_method(self, engine):
         code = """
 class Calculator:
     def add(self, a, b):
@@ -132,8 +144,47 @@ class MathUtils:
         calculator_start = next(i for i, line in enumerate(lines) if "class Calculator:" in line)
         assert any("def add" in line for line in lines[math_utils_start:])
     
-    def test_remove_dead_code(self):
-        engine = RefactoringEngine()
+    def test_inline_variable_splices_source(self, engine):
+        code = """
+def total(x, y):
+    # Sum first
+    temp = x + y
+    return temp * 2  # doubled
+"""
+        operation = RefactoringOperation(
+            type="inline_variable",
+            variable_name="temp"
+        )
+        
+        result = engine.apply_refactoring(code, operation)
+        assert result == code.replace("    temp = x + y\n", "").replace("temp * 2", "(x + y) * 2")
+    
+    def test_move_method_splices_source(self, engine):
+        code = """
+class Calculator:
+    # Adds two numbers
+    @staticmethod
+    def add(a, b):
+        return a + b  # plain
+
+    def sub(self, a, b):
+        return a - b
+
+class MathUtils:
+    pass
+"""
+        operation = RefactoringOperation(
+            type="move_method",
+            method_name="add",
+            source_class="Calculator",
+            target_class="MathUtils"
+        )
+        
+        result = engine.apply_refactoring(code, operation)
+        assert "    # Adds two numbers\n\n    def sub" in result
+        assert result.endswith("    pass\n\n    @staticmethod\n    def add(a, b):\n        return a + b  # plain\n")
+    
+    def test_remove_dead_code(self, engine):
         code = """
 def active_function():
     return "active"
@@ -154,8 +205,149 @@ def main():
         assert "def active_function" in result
         assert "def main" in result
     
-    def test_validate_refactoring(self):
+    def test_remove_dead_code_splices_source(self, engine):
+        code = """
+# Entry points
+def active_function():
+    return "active"  # kept as is
+
+@cached
+def unused_function():
+    return "unused"
+
+def main():
+    return active_function()
+"""
+        operation = RefactoringOperation(
+            type="remove_dead_code",
+            dead_functions=["unused_function"]
+        )
+        
+        result = engine.apply_refactoring(code, operation)
+        assert result == code.replace('@cached\ndef unused_function():\n    return "unused"\n\n', "")
+    
+    def test_remove_dead_code_finds_unreachable_functions(self, engine):
+        code = """
+def _helper():
+    return 1
+
+def _active_function():
+    return _helper()
+
+def _unused_function():
+    return _active_function()
+
+def _unused_recursive(n):
+    return _unused_recursive(n - 1)
+
+@register
+def _handler():
+    pass
+
+def main():
+    _active_function()
+"""
+        operation = RefactoringOperation(type="remove_dead_code")
+        
+        result = engine.apply_refactoring(code, operation)
+        assert "def _unused_function" not in result
+        assert "def _unused_recursive" not in result
+        for name in ("_helper", "_active_function", "_handler", "main"):
+            assert f"def {name}" in result
+    
+    def test_remove_dead_code_keeps_public_functions_without_all(self, engine):
+        code = "def add(a, b):\n    return a + b\n\ndef _unused():\n    pass\n"
+        operation = RefactoringOperation(type="remove_dead_code")
+        
+        assert engine.apply_refactoring(code, operation) == "def add(a, b):\n    return a + b\n\n"
+        exported = '__all__ = ["add"]\n\n' + code.replace("_unused", "unused")
+        assert "def unused" not in engine.apply_refactoring(exported, operation)
+    
+    def test_remove_dead_code_keeps_methods_sharing_a_dead_name(self, engine):
+        code = """
+def _helper():
+    return 0
+
+class K:
+    def _helper(self):
+        return 1
+
+def main():
+    return K()._helper()
+"""
+        operation = RefactoringOperation(type="remove_dead_code")
+        
+        result = engine.apply_refactoring(code, operation)
+        assert result == code.replace("def _helper():\n    return 0\n\n", "")
+    
+    def test_apply_refactorings_matches_sequential_renames(self, engine):
+        code = """
+def calc(x):
+    return helper(x) + x
+
+def helper(y):
+    return y * 2
+"""
+        operations = [
+            RefactoringOperation(type="rename_function", old_name="calc", new_name="total"),
+            RefactoringOperation(type="rename_variable", old_name="x", new_name="value"),
+            RefactoringOperation(type="rename_function", old_name="helper", new_name="calc"),
+            RefactoringOperation(type="rename_function", old_name="calc", new_name="double"),
+        ]
+        
+        expected = code
+        for operation in operations:
+            expected = engine.apply_refactoring(expected, operation)
+        
+        result = engine.apply_refactorings(code, operations)
+        assert result == expected
+        assert "def total(value):" in result
+        assert "return double(value) + value" in result
+        assert "def double(y):" in result
+    
+    def test_rename_preserves_comments_and_formatting(self, engine):
+        code = """
+# Totals
+def calc(a, b):  # keep me
+    return calc_helper(a) + \\
+        calc(b, 0)
+"""
+        operation = RefactoringOperation(
+            type="rename_function",
+            old_name="calc",
+            new_name="calculate_sum"
+        )
+        
+        result = engine.apply_refactoring(code, operation)
+        assert result == code.replace("def calc(", "def calculate_sum(").replace("calc(b", "calculate_sum(b")
+    
+    def test_repeated_refactoring_is_cached(self):
+        # Own instance so the cache statistics start at zero
         engine = RefactoringEngine()
+        code = "def unused():\n    pass\n\ndef main():\n    pass\n"
+        
+        first = engine.apply_refactoring(code, RefactoringOperation(type="remove_dead_code", dead_functions=["unused"]))
+        second = engine.apply_refactoring(code, RefactoringOperation(type="remove_dead_code", dead_functions=["unused"]))
+        other = engine.apply_refactoring(code, RefactoringOperation(type="remove_dead_code", dead_functions=["main"]))
+        
+        assert second is first
+        assert "def main" not in other
+        assert engine._apply_cached.cache_info().hits == 1
+    
+    def test_rename_falls_back_to_unparse_and_keeps_cache_intact(self, engine):
+        # "ﬁle" is spelled differently in the source than in the AST (NFKC),
+        # so the text cannot be spliced and the tree is unparsed instead
+        code = "ﬁle = 1\nprint(file)\n"
+        operation = RefactoringOperation(
+            type="rename_variable",
+            old_name="file",
+            new_name="path"
+        )
+        
+        assert engine.apply_refactoring(code, operation) == "path = 1\nprint(path)"
+        assert _parse_cached(code).body[0].targets[0].id == "file"
+    
+    def test_validate_refactoring(self, engine):
         code = "def test(): return 42"
         
         valid_operation = RefactoringOperation(
@@ -173,8 +365,17 @@ def main():
         assert engine.validate_refactoring(code, valid_operation) == True
         assert engine.validate_refactoring(code, invalid_operation) == False
     
-    def test_preserve_semantics(self):
-        engine = RefactoringEngine()
+    def test_validate_rename_requires_an_identifier(self, engine):
+        code = "def total(items):\n    # sum of prices\n    return sum(items)\n"
+        
+        def rename(old_name):
+            return RefactoringOperation(type="rename_variable", old_name=old_name, new_name="renamed")
+        
+        assert engine.validate_refactoring(code, rename("items"))
+        assert not engine.validate_refactoring(code, rename("item"))
+        assert not engine.validate_refactoring(code, rename("prices"))
+    
+    def test_preserve_semantics(self, engine):
         code = """
 def fibonacci(n):
     if n <= 1:
@@ -191,8 +392,54 @@ def fibonacci(n):
         
         assert engine.preserve_semantics(code, result) == True
     
-    def test_unsupported_operation(self):
+    def test_same_structure_ignores_renames_only(self, engine):
+        code = """
+def fibonacci(n):
+    if n <= 1:
+        return n
+    return fibonacci(n-1) + fibonacci(n-2)
+"""
+        renamed = engine.apply_refactoring(code, RefactoringOperation(
+            type="rename_variable",
+            old_name="n",
+            new_name="number"
+        ))
+        
+        assert engine.same_structure(code, renamed)
+        assert not engine.same_structure(code, code.replace("n-2", "n-3"))
+        assert not engine.same_structure(code, "def broken(:")
+    
+    def test_checks_do_not_share_trees_with_transforms(self, engine):
+        code = "def calc(a, b):\n    return a + b\n"
+        operation = RefactoringOperation(
+            type="rename_function",
+            old_name="calc",
+            new_name="add"
+        )
+        
+        assert engine.validate_refactoring(code, operation) == True
+        engine.apply_refactoring(code, operation)
+        
+        # The rename must not have mutated the tree cached by validation
+        assert _parse_cached(code).body[0].name == "calc"
+        assert engine.validate_refactoring("def broken(:", operation) == False
+    
+    def test_engine_is_reentrant(self):
+        # Own instance so the calls below are not served by the result cache
         engine = RefactoringEngine()
+        codes = [f"def calc(a):\n    temp = a + {i}\n    return temp * 2\n" for i in range(40)]
+        operations = [
+            RefactoringOperation(type="inline_variable", variable_name="temp"),
+            RefactoringOperation(type="rename_function", old_name="calc", new_name="total"),
+        ]
+        expected = [RefactoringEngine().apply_refactorings(code, operations) for code in codes]
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda code: engine.apply_refactorings(code, operations), codes))
+        
+        assert results == expected
+    
+    def test_unsupported_operation(self, engine):
         code = "def test(): pass"
         
         operation = RefactoringOperation(